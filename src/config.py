@@ -12,6 +12,14 @@ FACEBOOK_USERNAME = "csgocasescom"
 DISCORD_GUILD_ID = "1263461920791466055"
 DISCORD_CHANNEL_ID = "1279122419994595361"
 
+# Discord (guild ID, channel ID) pairs watched for new messages
+DISCORD_CHANNELS = [
+    (DISCORD_GUILD_ID, DISCORD_CHANNEL_ID),
+]
+
+# Discord Gateway used for real-time messages (point it at tests/fake_discord_gateway.py to test locally)
+DISCORD_GATEWAY_URL = "wss://gateway.discord.gg"
+
 # Baisc auth for X (Twitter) API
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
 BEARER_TOKEN = "AAAAAAAAAAAAAAAAAAAAANRILgAAAAAAnNwIzUejRCOuH5E6I8xnZz4puTs%3D1Zv7ttfk8LF81IUq16cHjhLTvJu4FA33AGWWjCpTnA"
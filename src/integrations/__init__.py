@@ -1,5 +1,5 @@
 from .instagram import InstagramAPI
 from .facebook import FacebookAPI
-from .discord import DiscordAPI
+from .discord import DiscordAPI, DiscordGateway, PartialFetchError
 from .x import XTwitterAPI
 from .csgocases import CSGOCasesAPI
@@ -1,53 +1,473 @@
 import os
 import json
-import requests
+import random
+import asyncio
 from datetime import datetime
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+import aiohttp
 
 from models import Post
-from config import DEBUG, USER_AGENT
+from config import DEBUG, DISCORD_GATEWAY_URL, USER_AGENT
+from utils.metrics import span
+from utils.selector import Field, Schema, SelectorError
+from utils.http import AsyncHTTPClient, HTTPClient, get_default_async_client, get_default_client
+
+if TYPE_CHECKING:
+    from pipeline.logger import Logger
+
+
+MESSAGE_POST = Schema(
+    id=Field("id"),
+    author=Field("author.username", default=""),
+    author_id=Field("author.id", default=""),
+    text=Field("content", default=""),
+    # Announcement bots post their text in embeds; most messages have none, so they're only read when present
+    embeds=Field("embeds", default_factory=list),
+    media_urls=Field("attachments[*].url", default_factory=list),
+    created_at=Field("timestamp", convert=datetime.fromisoformat),
+)
+EMBED_TEXT = Schema(
+    titles=Field("[*].title", default_factory=list),
+    descriptions=Field("[*].description", default_factory=list),
+)
+
+
+class PartialFetchError(Exception):
+    """Raised when some of the feeds fetched in one poll failed. Carries the posts of the feeds that didn't."""
+
+    def __init__(self, posts: list[Post], errors: list[BaseException], total: int) -> None:
+        super().__init__(f"{len(errors)} of {total} feeds failed, first with: {errors[0]!r}")
+        self.posts = posts
+        self.errors = errors
 
 
 class DiscordAPI:
     BASE_MESSAGES_URL = "https://discord.com/api/v10/channels/{channel_id}/messages"
+    # The most messages the REST API returns per request
+    MAX_MESSAGES = 100
 
-    def __init__(self, auth_token: str) -> None:
+    def __init__(
+        self,
+        auth_token: str,
+        http: Optional[HTTPClient] = None,
+        async_http: Optional[AsyncHTTPClient] = None,
+        logger: Optional["Logger"] = None,
+    ) -> None:
         self.auth_token = auth_token
+        self.http = http or get_default_client()
+        self.async_http = async_http or get_default_async_client()
+        self.logger = logger
+
+        # Newest message ID (snowflake) returned by `fetch_new_posts` per channel
+        self.last_seen_ids: dict[str, int] = {}
 
     def fetch_latest_post(self, guild_id: str, channel_id: str) -> Optional[Post]:
         """Fetch the latest post from a Discord channel."""
 
-        if DEBUG:  # Mock response for debugging
-            with open("data/mock_discord_messages.json", "r", encoding="utf-8") as f:
-                response = json.load(f)
-        else:
-            response = requests.get(
-                self.BASE_MESSAGES_URL.format(channel_id=channel_id),
-                headers={
-                    "Authorization": self.auth_token,
-                    "User-Agent": USER_AGENT,
-                },
-                params={"limit": 1},
-            )
-            if response.status_code != 200:
-                return None
-
-            response = response.json()
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_discord_messages.json", "r", encoding="utf-8") as f:
+                    response = json.load(f)
+            else:
+                response = self.http.get(
+                    self.BASE_MESSAGES_URL.format(channel_id=channel_id),
+                    headers=self._headers(),
+                    params={"limit": 1},
+                )
+                response.raise_for_status()
+
+                response = response.json()
+
+        with span("parse"):
+            return self._parse_latest_post(response, guild_id, channel_id)
+
+    async def fetch_latest_post_async(self, guild_id: str, channel_id: str) -> Optional[Post]:
+        """Fetch the latest post from a Discord channel without blocking the event loop."""
+
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_discord_messages.json", "r", encoding="utf-8") as f:
+                    response = json.load(f)
+            else:
+                response = await self.async_http.get(
+                    self.BASE_MESSAGES_URL.format(channel_id=channel_id),
+                    headers=self._headers(),
+                    params={"limit": 1},
+                )
+                response.raise_for_status()
+
+                response = response.json()
+
+        with span("parse"):
+            return self._parse_latest_post(response, guild_id, channel_id)
+
+    def fetch_new_posts(self, channels: list[tuple[str, str]]) -> list[Post]:
+        """Fetch every message posted since the previous call in each (guild ID, channel ID) pair, newest first.
+
+        The first call for a channel only returns its latest message.
+        """
+
+        posts = []
+        for guild_id, channel_id in channels:
+            posts.extend(self.fetch_channel_new_posts(guild_id, channel_id))
+
+        return posts
+
+    async def fetch_new_posts_async(self, channels: list[tuple[str, str]]) -> list[Post]:
+        """Fetch every new message in all channels at once without blocking the event loop.
+
+        A channel that fails keeps its watermark and is caught up on the next call. When every channel failed
+        the first error is raised; when only some did, `PartialFetchError` is raised with the posts of the
+        others, so the poll still counts as failed.
+        """
 
+        results = await asyncio.gather(
+            *(self.fetch_channel_new_posts_async(guild_id, channel_id) for guild_id, channel_id in channels),
+            return_exceptions=True,
+        )
+
+        posts, errors = [], []
+        for (_, channel_id), result in zip(channels, results):
+            if isinstance(result, BaseException):
+                self._log("warn", f"Fetching Discord channel {channel_id} failed: {result!r}")
+                errors.append(result)
+            else:
+                posts.extend(result)
+
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        if errors:
+            raise PartialFetchError(posts, errors, len(results))
+
+        return posts
+
+    def fetch_channel_new_posts(self, guild_id: str, channel_id: str) -> list[Post]:
+        """Fetch every message posted in a channel since the previous call, newest first."""
+
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_discord_messages.json", "r", encoding="utf-8") as f:
+                    response = json.load(f)
+            else:
+                response = self.http.get(
+                    self.BASE_MESSAGES_URL.format(channel_id=channel_id),
+                    headers=self._headers(),
+                    params=self._new_messages_params(channel_id),
+                )
+                response.raise_for_status()
+
+                response = response.json()
+
+        with span("parse"):
+            return self._parse_new_posts(response, guild_id, channel_id)
+
+    async def fetch_channel_new_posts_async(self, guild_id: str, channel_id: str) -> list[Post]:
+        """Fetch every message posted in a channel since the previous call without blocking the event loop."""
+
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_discord_messages.json", "r", encoding="utf-8") as f:
+                    response = json.load(f)
+            else:
+                response = await self.async_http.get(
+                    self.BASE_MESSAGES_URL.format(channel_id=channel_id),
+                    headers=self._headers(),
+                    params=self._new_messages_params(channel_id),
+                )
+                response.raise_for_status()
+
+                response = response.json()
+
+        with span("parse"):
+            return self._parse_new_posts(response, guild_id, channel_id)
+
+    def _headers(self) -> dict[str, str]:
+        return {
+            "Authorization": self.auth_token,
+            "User-Agent": USER_AGENT,
+        }
+
+    def _new_messages_params(self, channel_id: str) -> dict[str, Any]:
+        last_seen_id = self.last_seen_ids.get(channel_id)
+        if last_seen_id is None:
+            return {"limit": 1}
+
+        # Messages right after the watermark; anything beyond the limit is picked up on the next poll
+        return {"after": str(last_seen_id), "limit": self.MAX_MESSAGES}
+
+    def _parse_latest_post(self, response: list[dict[str, Any]], guild_id: str, channel_id: str) -> Optional[Post]:
         if not response:
             return None
 
-        latest_message = response[0]
-        author_info = latest_message.get("author", {})
-        author_username = author_info.get("username", "")
-        author_url = f"https://discord.com/users/{author_info.get('id', '')}"
+        latest_message = max(response, key=lambda message: int(message.get("id", 0)))
+        return self._parse_post(latest_message, guild_id, channel_id)
+
+    def _parse_new_posts(self, response: list[dict[str, Any]], guild_id: str, channel_id: str) -> list[Post]:
+        messages = sorted(response, key=lambda message: int(message.get("id", 0)), reverse=True)
+        if not messages:
+            return []
+
+        last_seen_id = self.last_seen_ids.get(channel_id)
+        self.last_seen_ids[channel_id] = max(int(messages[0].get("id", 0)), last_seen_id or 0)
+
+        if last_seen_id is None:
+            return [self._parse_post(messages[0], guild_id, channel_id)]
+
+        return [
+            self._parse_post(message, guild_id, channel_id)
+            for message in messages
+            if int(message.get("id", 0)) > last_seen_id
+        ]
+
+    def _parse_post(self, message: dict[str, Any], guild_id: str, channel_id: str) -> Post:
+        fields = MESSAGE_POST.extract(message)
+        media_urls = fields["media_urls"]
+
+        text = fields["text"]
+        if fields["embeds"]:
+            embeds = EMBED_TEXT.extract(fields["embeds"])
+            text = "\n".join(filter(None, [text, *embeds["titles"], *embeds["descriptions"]]))
 
         return Post(
             platform="Discord",
-            author=author_username,
-            author_url=author_url,
-            text=latest_message.get("content", ""),
-            url=f"https://discord.com/channels/{guild_id}/{channel_id}/{latest_message.get('id', '')}",
-            media_url=latest_message.get("attachments", [{}])[0].get("url", None),
-            created_at=datetime.fromisoformat(latest_message.get("timestamp", "")),
+            author=fields["author"],
+            author_url=f"https://discord.com/users/{fields['author_id']}",
+            text=text,
+            url=f"https://discord.com/channels/{guild_id}/{channel_id}/{fields['id']}",
+            media_url=media_urls[0] if media_urls else None,
+            media_urls=media_urls,
+            created_at=fields["created_at"],
+            raw_data=message,
         )
+
+    def _log(self, level: str, message: str) -> None:
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
+
+
+class DiscordGateway:
+    """Real-time Discord mode: holds a Gateway websocket and pushes new messages as they are posted.
+
+    Only `MESSAGE_CREATE` events for the watched channels are turned into posts. Heartbeats keep the
+    connection alive; a missed heartbeat ACK, a server `RECONNECT` or a dropped socket reconnects and
+    resumes the session so no events are lost, with exponential backoff between attempts. While the
+    gateway is down, the REST poller in `DiscordAPI` remains the fallback.
+    """
+
+    # Gateway opcodes
+    DISPATCH = 0
+    HEARTBEAT = 1
+    IDENTIFY = 2
+    RESUME = 6
+    RECONNECT = 7
+    INVALID_SESSION = 9
+    HELLO = 10
+    HEARTBEAT_ACK = 11
+
+    # GUILDS | GUILD_MESSAGES | MESSAGE_CONTENT
+    INTENTS = (1 << 0) | (1 << 9) | (1 << 15)
+
+    # Close codes after which reconnecting cannot help (bad token, bad intents, ...)
+    FATAL_CLOSE_CODES = {4004, 4010, 4011, 4012, 4013, 4014}
+    # Close codes after which the session cannot be resumed and must be identified again
+    SESSION_CLOSE_CODES = {4007, 4009}
+    # Closing with a non-1000 code keeps the session resumable
+    RESUMABLE_CLOSE_CODE = 4000
+
+    def __init__(
+        self,
+        api: DiscordAPI,
+        channels: list[tuple[str, str]],
+        on_post: Callable[[Post], Awaitable[None]],
+        logger: Optional["Logger"] = None,
+        url: str = DISCORD_GATEWAY_URL,
+        max_backoff: float = 60.0,
+    ) -> None:
+        self.api = api
+        self.guild_ids = {channel_id: guild_id for guild_id, channel_id in channels}
+        self.on_post = on_post
+        self.logger = logger
+        self.url = url
+        self.max_backoff = max_backoff
+
+        self.connected = False
+        self.session_id: Optional[str] = None
+        self.sequence: Optional[int] = None
+        self.resume_url: Optional[str] = None
+
+        self._task: Optional[asyncio.Task] = None
+        self._ack_received = True
+        self._failures = 0
+        self._dispatches: set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Connect to the gateway in the background on the running event loop."""
+
+        if not self.running:
+            self._task = asyncio.create_task(self.run(), name="discord-gateway")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        # Posts still waiting for room in the pipeline
+        dispatches = list(self._dispatches)
+        for task in dispatches:
+            task.cancel()
+        await asyncio.gather(*dispatches, return_exceptions=True)
+
+        self.connected = False
+
+    async def run(self) -> None:
+        """Stay connected until cancelled or the gateway rejects us for good."""
+
+        while True:
+            try:
+                close_code = await self._connect()
+            except (aiohttp.ClientError, TimeoutError, ConnectionError, ValueError) as e:
+                close_code = None
+                # Only the first failure in a row is worth a warning; the rest are retries of the same outage
+                self._log("warn" if self._failures == 0 else "debug", f"Discord gateway connection failed: {e}")
+            except Exception as e:
+                # A payload we didn't expect; a new connection starts from a clean state
+                close_code = None
+                self._log("error", f"Discord gateway connection failed unexpectedly: {e!r}")
+            finally:
+                self.connected = False
+
+            if close_code in self.FATAL_CLOSE_CODES:
+                self._log("error", f"Discord gateway closed the connection ({close_code}). Falling back to polling.")
+                return
+
+            if close_code in self.SESSION_CLOSE_CODES:
+                self._reset_session()
+
+            delay = min(self.max_backoff, 2**self._failures) * random.uniform(0.5, 1.0)
+            self._failures += 1
+            self._log("debug", f"Reconnecting to the Discord gateway in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+    async def _connect(self) -> Optional[int]:
+        resuming = self.session_id is not None and self.sequence is not None
+        url = (self.resume_url if resuming and self.resume_url else self.url) + "/?v=10&encoding=json"
+
+        # READY payloads of accounts in many guilds easily exceed aiohttp's 4 MiB default
+        async with self.api.async_http.session.ws_connect(url, max_msg_size=0, autoping=True) as ws:
+            hello = await ws.receive_json(timeout=self.api.async_http.timeout)
+            if hello.get("op") != self.HELLO:
+                raise ValueError(f"expected HELLO, got opcode {hello.get('op')}")
+
+            self._ack_received = True
+            heartbeat = asyncio.create_task(self._heartbeat(ws, hello["d"]["heartbeat_interval"] / 1000))
+            try:
+                if resuming:
+                    await ws.send_json(
+                        {
+                            "op": self.RESUME,
+                            "d": {"token": self.api.auth_token, "session_id": self.session_id, "seq": self.sequence},
+                        }
+                    )
+                else:
+                    await ws.send_json(
+                        {
+                            "op": self.IDENTIFY,
+                            "d": {
+                                "token": self.api.auth_token,
+                                "intents": self.INTENTS,
+                                "properties": {"os": "linux", "browser": "csgocases-promocodes", "device": ""},
+                            },
+                        }
+                    )
+
+                async for message in ws:
+                    if message.type == aiohttp.WSMsgType.TEXT:
+                        await self._handle(ws, json.loads(message.data))
+                    elif message.type == aiohttp.WSMsgType.ERROR:
+                        raise ws.exception() or ConnectionError("websocket error")
+            finally:
+                heartbeat.cancel()
+
+            return ws.close_code
+
+    async def _heartbeat(self, ws: aiohttp.ClientWebSocketResponse, interval: float) -> None:
+        # The first beat is jittered so that reconnecting clients don't all beat at once
+        await asyncio.sleep(interval * random.random())
+
+        while not ws.closed:
+            if not self._ack_received:
+                self._log("warn", "Discord gateway stopped acknowledging heartbeats. Reconnecting...")
+                await ws.close(code=self.RESUMABLE_CLOSE_CODE)
+                return
+
+            self._ack_received = False
+            await ws.send_json({"op": self.HEARTBEAT, "d": self.sequence})
+            await asyncio.sleep(interval)
+
+    async def _handle(self, ws: aiohttp.ClientWebSocketResponse, payload: dict[str, Any]) -> None:
+        op = payload.get("op")
+        if payload.get("s") is not None:
+            self.sequence = payload["s"]
+
+        if op == self.DISPATCH:
+            self._dispatch(payload.get("t"), payload.get("d") or {})
+        elif op == self.HEARTBEAT:
+            await ws.send_json({"op": self.HEARTBEAT, "d": self.sequence})
+        elif op == self.HEARTBEAT_ACK:
+            self._ack_received = True
+        elif op == self.RECONNECT:
+            self._log("debug", "Discord gateway asked to reconnect.")
+            await ws.close(code=self.RESUMABLE_CLOSE_CODE)
+        elif op == self.INVALID_SESSION:
+            if not payload.get("d"):
+                self._reset_session()
+            await asyncio.sleep(random.uniform(1, 5))
+            await ws.close(code=self.RESUMABLE_CLOSE_CODE)
+
+    def _dispatch(self, event: Optional[str], data: dict[str, Any]) -> None:
+        if event == "READY":
+            self.session_id = data.get("session_id")
+            self.resume_url = data.get("resume_gateway_url")
+            self._connected()
+            self._log("info", "Connected to the Discord gateway.")
+        elif event == "RESUMED":
+            self._connected()
+            self._log("debug", "Resumed the Discord gateway session.")
+        elif event == "MESSAGE_CREATE":
+            channel_id = data.get("channel_id", "")
+            if channel_id not in self.guild_ids:
+                return
+
+            try:
+                post = self.api._parse_post(data, self.guild_ids[channel_id], channel_id)
+                message_id = int(data.get("id", 0))
+            except (SelectorError, ValueError) as e:
+                self._log("warn", f"Skipping a Discord message the gateway sent in an unexpected shape: {e}")
+                return
+
+            # Keep the REST watermark in step so a fallback poll only fetches what the gateway missed
+            self.api.last_seen_ids[channel_id] = max(message_id, self.api.last_seen_ids.get(channel_id) or 0)
+
+            # Don't stall the socket (and its heartbeat ACKs) while the pipeline is saturated
+            task = asyncio.create_task(self.on_post(post))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    def _connected(self) -> None:
+        self.connected = True
+        self._failures = 0
+
+    def _reset_session(self) -> None:
+        self.session_id = None
+        self.sequence = None
+        self.resume_url = None
+
+    def _log(self, level: str, message: str) -> None:
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
@@ -1,64 +1,170 @@
 import json
-import requests
+import asyncio
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
 from models import Post
 from config import DEBUG, USER_AGENT
-from utils.soup import extract_json_objects_containing_key, deep_find
+from utils.metrics import span
+from utils.http import STREAM_CHUNK_SIZE, AsyncHTTPClient, HTTPClient, get_default_async_client, get_default_client
+from utils.soup import KeyFinder, ScriptScanner, scan_json_objects_containing_key
+from utils.selector import Field, Schema
+
+LATEST_STORY = Field("timeline_list_feed_units.edges[0].node.comet_sections", default=None)
+STORY_POST = Schema(
+    author=Field("content.story.actors[0].name", default="unknown"),
+    author_url=Field("content.story.actors[0].url", default=""),
+    text=Field("content.story.message.text", default=""),
+    url=Field("content.story.wwwURL", default=""),
+    media_urls=Field("content.story.attachments[*].styles.attachment.media.photo_image.uri", default_factory=list),
+    created_at=Field("timestamp.story.creation_time", default=datetime.fromtimestamp(0), convert=datetime.fromtimestamp),
+)
 
 
 class FacebookAPI:
     BASE_URL = "https://www.facebook.com/{username}/"
+    FEED_KEY = "timeline_list_feed_units"
+
+    def __init__(
+        self,
+        http: Optional[HTTPClient] = None,
+        async_http: Optional[AsyncHTTPClient] = None,
+        streaming: bool = True,
+    ) -> None:
+        """With `streaming`, the page is scanned as it downloads and dropped as soon as the feed has arrived."""
+
+        self.http = http or get_default_client()
+        self.async_http = async_http or get_default_async_client()
+        self.streaming = streaming
 
-    def __init__(self) -> None:
-        pass
+        # The profile payload keeps the same shape between polls, so the path to "user" is remembered
+        self.user_finder = KeyFinder("user")
 
     def fetch_latest_post(self, username: str) -> Optional[Post]:
         if DEBUG:
-            with open("data/mock_facebook_user.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with span("fetch"):
+                with open("data/mock_facebook_user.json", "r", encoding="utf-8") as f:
+                    data = json.load(f)
+        elif self.streaming:
+            with span("fetch"):
+                matched = self._stream_feed(username)
+
+            with span("parse"):
+                data = self._find_user(matched)
+                if data is None:
+                    return None
         else:
-            response = requests.get(
-                self.BASE_URL.format(username=username),
-                headers={
-                    "Accept": "text/xhtml,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-                    "Sec-Fetch-Mode": "navigate",
-                    "User-Agent": USER_AGENT,
-                },
-            )
-
-            if response.status_code != 200:
-                return None
-
-            matches = extract_json_objects_containing_key(response.text, "timeline_list_feed_units")
-            if not matches:
-                return None
-
-            matched = matches[0]  # Maybe improve later by selecting best match
-            data = deep_find(matched, "user")
-            if not data or not isinstance(data, dict):
-                return None
-
-        edges = data.get("timeline_list_feed_units", {}).get("edges", [])
-        if not edges:
+            with span("fetch"):
+                response = self.http.get(self.BASE_URL.format(username=username), headers=self._headers())
+
+                response.raise_for_status()
+
+            with span("parse"):
+                data = self._extract_user(response.text)
+                if data is None:
+                    return None
+
+        with span("parse"):
+            return self._parse_latest_post(data)
+
+    async def fetch_latest_post_async(self, username: str) -> Optional[Post]:
+        if DEBUG:
+            with span("fetch"):
+                with open("data/mock_facebook_user.json", "r", encoding="utf-8") as f:
+                    data = json.load(f)
+        elif self.streaming:
+            with span("fetch"):
+                matched = await self._stream_feed_async(username)
+
+            with span("parse"):
+                data = self._find_user(matched)
+                if data is None:
+                    return None
+        else:
+            with span("fetch"):
+                response = await self.async_http.get(self.BASE_URL.format(username=username), headers=self._headers())
+
+                response.raise_for_status()
+
+            with span("parse"):
+                # Parsing a multi-megabyte page is CPU-bound; keep it off the event loop
+                data = await asyncio.to_thread(self._extract_user, response.text)
+                if data is None:
+                    return None
+
+        with span("parse"):
+            return self._parse_latest_post(data)
+
+    def _headers(self) -> dict[str, str]:
+        return {
+            "Accept": "text/xhtml,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+            "Sec-Fetch-Mode": "navigate",
+            "User-Agent": USER_AGENT,
+        }
+
+    def _stream_feed(self, username: str) -> Optional[dict[str, Any]]:
+        """Read the page until the first script block holding the feed has arrived, then close the connection."""
+
+        scanner = ScriptScanner(self.FEED_KEY)
+
+        with self.http.stream(self.BASE_URL.format(username=username), headers=self._headers()) as response:
+            response.raise_for_status()
+
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                for content in scanner.feed(chunk):
+                    try:
+                        return json.loads(content)
+                    except json.JSONDecodeError:
+                        continue
+
+        return None
+
+    async def _stream_feed_async(self, username: str) -> Optional[dict[str, Any]]:
+        scanner = ScriptScanner(self.FEED_KEY)
+
+        async with self.async_http.stream(self.BASE_URL.format(username=username), headers=self._headers()) as response:
+            response.raise_for_status()
+
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                for content in scanner.feed(chunk):
+                    try:
+                        # The feed is a large document; decode it off the event loop
+                        return await asyncio.to_thread(json.loads, content)
+                    except json.JSONDecodeError:
+                        continue
+
+        return None
+
+    def _extract_user(self, html: str) -> Optional[dict[str, Any]]:
+        matches = scan_json_objects_containing_key(html, self.FEED_KEY)
+        if not matches:
             return None
 
-        comet_sections = edges[0].get("node", {}).get("comet_sections", {})
-        story = comet_sections.get("content", {}).get("story", {})
+        return self._find_user(matches[0])  # Maybe improve later by selecting best match
+
+    def _find_user(self, matched: Optional[dict[str, Any]]) -> Optional[dict[str, Any]]:
+        if matched is None:
+            return None
+
+        data = self.user_finder.find(matched)
+        if not data or not isinstance(data, dict):
+            return None
+
+        return data
+
+    def _parse_latest_post(self, data: dict[str, Any]) -> Optional[Post]:
+        comet_sections = LATEST_STORY.get(data)
+        if comet_sections is None:
+            return None
+
+        fields = STORY_POST.extract(comet_sections)
+        media_urls = fields.pop("media_urls")
 
         return Post(
             platform="Facebook",
-            author=story.get("actors", [])[0].get("name", "unknown"),
-            author_url=story.get("actors", [])[0].get("url", ""),
-            text=story.get("message", {}).get("text", ""),
-            url=story.get("wwwURL", ""),
-            media_url=story.get("attachments", [])[0]
-            .get("styles", {})
-            .get("attachment", {})
-            .get("media", {})
-            .get("photo_image", {})
-            .get("uri", ""),
-            created_at=datetime.fromtimestamp(comet_sections.get("timestamp", {}).get("story", {}).get("creation_time", 0)),
+            media_url=media_urls[0] if media_urls else "",
+            media_urls=media_urls,
             raw_data=data,
+            **fields,
         )
+
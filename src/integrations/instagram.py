@@ -1,61 +1,161 @@
 import json
-import requests
 from datetime import datetime
 from typing import Optional, Any
 
 from models import Post
 from config import DEBUG, USER_AGENT
+from utils.metrics import span
+from utils.selector import Field, Schema
+from utils.jsonstream import aiter_items, iter_items
+from utils.http import STREAM_CHUNK_SIZE, AsyncHTTPClient, HTTPClient, get_default_async_client, get_default_client
+
+
+LATEST_MEDIA = Field("edge_owner_to_timeline_media.edges[0].node", default=None)
+MEDIA_POST = Schema(
+    text=Field("edge_media_to_caption.edges[0].node.text", default=""),
+    shortcode=Field("shortcode", default=""),
+    media_url=Field("display_url", default=None),
+    # Only carousels list their images; `Post` falls back to `media_url` for single images
+    media_urls=Field("edge_sidecar_to_children.edges[*].node.display_url", default_factory=list),
+    created_at=Field("taken_at_timestamp", default=datetime.fromtimestamp(0), convert=datetime.fromtimestamp),
+)
 
 
 class InstagramAPI:
     BASE_PROFILE_API_ENDPOINT = "https://www.instagram.com/api/v1/users/web_profile_info/"
+    # Where the timeline sits in the profile document, newest media first
+    TIMELINE_EDGES_PATH = ("data", "user", "edge_owner_to_timeline_media", "edges")
 
     def __init__(
         self,
         app_id: str = "936619743392459",
         server_id: str = "1031060024",
+        http: Optional[HTTPClient] = None,
+        async_http: Optional[AsyncHTTPClient] = None,
+        streaming: bool = True,
     ) -> None:
+        """With `streaming`, the latest post is read from the profile as it downloads and the rest is dropped."""
+
         self.app_id = app_id
         self.server_id = server_id
+        self.streaming = streaming
+        self.http = http or get_default_client()
+        self.async_http = async_http or get_default_async_client()
 
     def fetch_profile(self, username: str) -> Optional[dict[str, Any]]:
-        if DEBUG:  # Mock response for debugging
-            with open("data/mock_instagram_profile.json", "r", encoding="utf-8") as f:
-                response = json.load(f)
-        else:
-            response = requests.get(
-                self.BASE_PROFILE_API_ENDPOINT,
-                headers={
-                    "User-Agent": USER_AGENT,
-                    "X-IG-App-ID": self.app_id,
-                    "X-Instagram-AJAX": self.server_id,
-                },
-                params={"username": username},
-            )
-            if response.status_code != 200:
-                return None
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_instagram_profile.json", "r", encoding="utf-8") as f:
+                    response = json.load(f)
+            else:
+                response = self.http.get(
+                    self.BASE_PROFILE_API_ENDPOINT,
+                    headers=self._headers(),
+                    params={"username": username},
+                )
+                response.raise_for_status()
+
+                response = response.json()
+
+        return response.get("data", {}).get("user", None)
 
-            response = response.json()
+    async def fetch_profile_async(self, username: str) -> Optional[dict[str, Any]]:
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_instagram_profile.json", "r", encoding="utf-8") as f:
+                    response = json.load(f)
+            else:
+                response = await self.async_http.get(
+                    self.BASE_PROFILE_API_ENDPOINT,
+                    headers=self._headers(),
+                    params={"username": username},
+                )
+                response.raise_for_status()
+
+                response = response.json()
 
         return response.get("data", {}).get("user", None)
 
     def fetch_latest_post(self, username: str) -> Optional[Post]:
+        if self.streaming:
+            edge = self._stream_latest_edge(username)
+
+            with span("parse"):
+                return self._parse_media((edge or {}).get("node"), username)
+
         profile = self.fetch_profile(username)
-        if not profile:
-            return None
 
-        edges = profile.get("edge_owner_to_timeline_media", {}).get("edges", [])
-        if not edges:
+        with span("parse"):
+            return self._parse_latest_post(profile, username)
+
+    async def fetch_latest_post_async(self, username: str) -> Optional[Post]:
+        if self.streaming:
+            edge = await self._stream_latest_edge_async(username)
+
+            with span("parse"):
+                return self._parse_media((edge or {}).get("node"), username)
+
+        profile = await self.fetch_profile_async(username)
+
+        with span("parse"):
+            return self._parse_latest_post(profile, username)
+
+    def _stream_latest_edge(self, username: str) -> Optional[dict[str, Any]]:
+        """Read the profile only up to the end of its first timeline edge."""
+
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_instagram_profile.json", "rb") as f:
+                    chunks = iter(lambda: f.read(STREAM_CHUNK_SIZE), b"")
+                    return next(iter_items(chunks, self.TIMELINE_EDGES_PATH), None)
+
+            with self.http.stream(
+                self.BASE_PROFILE_API_ENDPOINT, headers=self._headers(), params={"username": username}
+            ) as response:
+                response.raise_for_status()
+
+                return next(iter_items(response.iter_content(STREAM_CHUNK_SIZE), self.TIMELINE_EDGES_PATH), None)
+
+    async def _stream_latest_edge_async(self, username: str) -> Optional[dict[str, Any]]:
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_instagram_profile.json", "rb") as f:
+                    chunks = iter(lambda: f.read(STREAM_CHUNK_SIZE), b"")
+                    return next(iter_items(chunks, self.TIMELINE_EDGES_PATH), None)
+
+            async with self.async_http.stream(
+                self.BASE_PROFILE_API_ENDPOINT, headers=self._headers(), params={"username": username}
+            ) as response:
+                response.raise_for_status()
+
+                async for edge in aiter_items(response.content.iter_chunked(STREAM_CHUNK_SIZE), self.TIMELINE_EDGES_PATH):
+                    return edge
+                return None
+
+    def _headers(self) -> dict[str, str]:
+        return {
+            "User-Agent": USER_AGENT,
+            "X-IG-App-ID": self.app_id,
+            "X-Instagram-AJAX": self.server_id,
+        }
+
+    def _parse_latest_post(self, profile: Optional[dict[str, Any]], username: str) -> Optional[Post]:
+        return self._parse_media(LATEST_MEDIA.get(profile), username)
+
+    def _parse_media(self, latest_post: Optional[dict[str, Any]], username: str) -> Optional[Post]:
+        if latest_post is None:
             return None
 
-        latest_post = edges[0].get("node", None)
+        fields = MEDIA_POST.extract(latest_post)
+
         return Post(
             platform="Instagram",
             author=username,
             author_url=f"https://www.instagram.com/{username}/",
-            text=latest_post.get("edge_media_to_caption", {}).get("edges", [{}])[0].get("node", {}).get("text", ""),
-            url=f"https://www.instagram.com/p/{latest_post.get('shortcode', '')}/",
-            media_url=latest_post.get("display_url", None),
-            created_at=datetime.fromtimestamp(latest_post.get("taken_at_timestamp", 0)),
+            text=fields["text"],
+            url=f"https://www.instagram.com/p/{fields['shortcode']}/",
+            media_url=fields["media_url"],
+            media_urls=fields["media_urls"],
+            created_at=fields["created_at"],
             raw_data=latest_post,
         )
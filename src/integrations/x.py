@@ -1,11 +1,42 @@
 import json
-import requests
 import base64
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Optional
 from datetime import datetime
 
 from models import Post
 from config import DEBUG, BEARER_TOKEN, USER_AGENT
+from utils.metrics import span
+from utils.selector import Field, Schema
+from utils.jsonstream import EACH, aiter_items, iter_items
+from utils.http import STREAM_CHUNK_SIZE, AsyncHTTPClient, HTTPClient, get_default_async_client, get_default_client
+
+if TYPE_CHECKING:
+    from pipeline.logger import Logger
+
+
+TIMELINE_INSTRUCTIONS = Field(
+    "data.user.result.timeline_v2.timeline.instructions",
+    "data.user.result.timeline.timeline.instructions",
+    default_factory=list,
+)
+# Timeline items hold a single tweet, conversation modules several; who-to-follow modules and cursors none.
+# Tweets with limited visibility wrap the actual tweet one level deeper.
+ITEM_TWEET = Field(
+    "content.itemContent.tweet_results.result.legacy",
+    "content.itemContent.tweet_results.result.tweet.legacy",
+    default=None,
+)
+MODULE_TWEETS = Field("content.items[*].item.itemContent.tweet_results.result", default_factory=list)
+TWEET = Field("legacy", "tweet.legacy", default=None)
+TWEET_POST = Schema(
+    id=Field("id_str"),
+    text=Field("full_text", default=""),
+    url=Field("entities.media[0].url", default=None),
+    media_urls=Field(
+        "extended_entities.media[*].media_url_https", "entities.media[*].media_url_https", default_factory=list
+    ),
+    created_at=Field("created_at", convert=lambda value: datetime.strptime(value, "%a %b %d %H:%M:%S %z %Y")),
+)
 
 
 class XTwitterAPI:
@@ -13,141 +44,418 @@ class XTwitterAPI:
         "https://x.com/i/api/graphql/vqu78dKcEkW-UAYLw5rriA/useFetchProfileSections_canViewExpandedProfileQuery"
     )
     BASE_USER_TWEETS_URL = "https://x.com/i/api/graphql/Y9WM4Id6UcGFE8Z-hbnixw/UserTweets"
+    USER_IDS_PATH = "data/x_user_ids.json"
+    # Timeline entries of a `UserTweets` response, newest first. The pinned tweet sits elsewhere and isn't
+    # streamed; it was already seen when it was posted
+    TIMELINE_ENTRIES_PATH = (
+        "data",
+        "user",
+        "result",
+        ("timeline_v2", "timeline"),
+        "timeline",
+        "instructions",
+        EACH,
+        "entries",
+    )
+
+    # Enough to catch a burst of tweets between two polls
+    USER_TWEETS_COUNT = 20
+    # Serialised once instead of on every poll
+    USER_TWEETS_FEATURES = json.dumps(
+        {
+            "profile_label_improvements_pcf_label_in_post_enabled": True,
+            "rweb_tipjar_consumption_enabled": True,
+            "responsive_web_graphql_exclude_directive_enabled": True,
+            "verified_phone_label_enabled": False,
+            "creator_subscriptions_tweet_preview_api_enabled": True,
+            "responsive_web_graphql_timeline_navigation_enabled": True,
+            "responsive_web_graphql_skip_user_profile_image_extensions_enabled": False,
+            "premium_content_api_read_enabled": False,
+            "communities_web_enable_tweet_community_results_fetch": True,
+            "c9s_tweet_anatomy_moderator_badge_enabled": True,
+            "responsive_web_grok_analyze_button_fetch_trends_enabled": False,
+            "responsive_web_grok_analyze_post_followups_enabled": True,
+            "responsive_web_jetfuel_frame": False,
+            "responsive_web_grok_share_attachment_enabled": True,
+            "articles_preview_enabled": True,
+            "responsive_web_edit_tweet_api_enabled": True,
+            "graphql_is_translatable_rweb_tweet_is_translatable_enabled": True,
+            "view_counts_everywhere_api_enabled": True,
+            "longform_notetweets_consumption_enabled": True,
+            "responsive_web_twitter_article_tweet_consumption_enabled": True,
+            "tweet_awards_web_tipping_enabled": False,
+            "responsive_web_grok_analysis_button_from_backend": True,
+            "creator_subscriptions_quote_tweet_preview_enabled": False,
+            "freedom_of_speech_not_reach_fetch_enabled": True,
+            "standardized_nudges_misinfo": True,
+            "tweet_with_visibility_results_prefer_gql_limited_actions_policy_enabled": True,
+            "rweb_video_timestamps_enabled": True,
+            "longform_notetweets_rich_text_read_enabled": True,
+            "longform_notetweets_inline_media_enabled": True,
+            "responsive_web_grok_image_annotation_enabled": False,
+            "responsive_web_enhance_cards_enabled": False,
+        }
+    )
+    USER_TWEETS_FIELD_TOGGLES = json.dumps({"withArticlePlainText": False})
+
+    def __init__(
+        self,
+        auth_token: str,
+        csrf_token: str,
+        http: Optional[HTTPClient] = None,
+        async_http: Optional[AsyncHTTPClient] = None,
+        streaming: bool = True,
+        logger: Optional["Logger"] = None,
+    ) -> None:
+        """With `streaming`, timelines are read as they download and only up to the first tweet already seen."""
 
-    def __init__(self, auth_token: str, csrf_token: str) -> None:
         self.auth_token = auth_token
         self.csrf_token = csrf_token
+        self.streaming = streaming
+        self.logger = logger
+        self.http = http or get_default_client()
+        self.async_http = async_http or get_default_async_client()
+
+        # Screen names map to user IDs for good, so they are only looked up once
+        self.user_ids = self._load_user_ids()
+        # Newest tweet ID returned by `fetch_new_posts` per screen name
+        self.last_seen_ids: dict[str, int] = {}
+
+    def _load_user_ids(self) -> dict[str, str]:
+        try:
+            with open(self.USER_IDS_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            # Only a cache: the IDs are looked up again as they're needed
+            self._log("warn", f"Error decoding X user ID cache: {e}. Starting with an empty cache.")
+            return {}
+
+    def _cache_user_id(self, username: str, user_id: str) -> str:
+        if not user_id:
+            return user_id
+
+        self.user_ids[username] = user_id
+        try:
+            with open(self.USER_IDS_PATH, "w", encoding="utf-8") as f:
+                json.dump(self.user_ids, f, indent=4)
+        except Exception as e:
+            # The ID is still kept in memory for this run
+            self._log("warn", f"Error saving X user ID cache: {e}")
+
+        return user_id
+
+    def _log(self, level: str, message: str) -> None:
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
 
     def fetch_user_id(self, username: str) -> str:
-        """Fetch user ID by username."""
+        """Fetch user ID by username, or take it from the user ID cache."""
+
+        if username in self.user_ids:
+            return self.user_ids[username]
+
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_x_user.json", "r", encoding="utf-8") as f:
+                    response = json.load(f)
+            else:
+                response = self.http.get(
+                    self.BASE_USER_BY_SCREEN_NAME_URL,
+                    headers=self._headers(),
+                    cookies=self._cookies(),
+                    params=self._user_by_screen_name_params(username),
+                )
+                response.raise_for_status()
+
+                response = response.json()
+
+        return self._cache_user_id(username, self._parse_user_id(response))
+
+    async def fetch_user_id_async(self, username: str) -> str:
+        """Fetch user ID by username without blocking the event loop, or take it from the user ID cache."""
 
+        if username in self.user_ids:
+            return self.user_ids[username]
+
+        with span("fetch"):
+            if DEBUG:  # Mock response for debugging
+                with open("data/mock_x_user.json", "r", encoding="utf-8") as f:
+                    response = json.load(f)
+            else:
+                response = await self.async_http.get(
+                    self.BASE_USER_BY_SCREEN_NAME_URL,
+                    headers=self._headers(),
+                    cookies=self._cookies(),
+                    params=self._user_by_screen_name_params(username),
+                )
+                response.raise_for_status()
+
+                response = response.json()
+
+        return self._cache_user_id(username, self._parse_user_id(response))
+
+    def fetch_latest_post(self, username: str) -> Optional[Post]:
+        """Fetch the latest post from a user by user ID."""
+
+        if self.streaming:
+            tweets = self._stream_user_tweets(username)
+
+            with span("parse"):
+                return self._latest_post(tweets, username)
+
+        response = self._fetch_user_tweets(username)
+
+        with span("parse"):
+            return self._parse_latest_post(response, username)
+
+    async def fetch_latest_post_async(self, username: str) -> Optional[Post]:
+        """Fetch the latest post from a user by user ID without blocking the event loop."""
+
+        if self.streaming:
+            tweets = await self._stream_user_tweets_async(username)
+
+            with span("parse"):
+                return self._latest_post(tweets, username)
+
+        response = await self._fetch_user_tweets_async(username)
+
+        with span("parse"):
+            return self._parse_latest_post(response, username)
+
+    def fetch_new_posts(self, username: str) -> list[Post]:
+        """Fetch every post published since the previous call for the same user, newest first.
+
+        The first call for a user only returns the latest post.
+        """
+
+        if self.streaming:
+            tweets = self._stream_user_tweets(username, self.last_seen_ids.get(username))
+
+            with span("parse"):
+                return self._new_posts(tweets, username)
+
+        response = self._fetch_user_tweets(username)
+
+        with span("parse"):
+            return self._parse_new_posts(response, username)
+
+    async def fetch_new_posts_async(self, username: str) -> list[Post]:
+        """Fetch every post published since the previous call for the same user without blocking the event loop."""
+
+        if self.streaming:
+            tweets = await self._stream_user_tweets_async(username, self.last_seen_ids.get(username))
+
+            with span("parse"):
+                return self._new_posts(tweets, username)
+
+        response = await self._fetch_user_tweets_async(username)
+
+        with span("parse"):
+            return self._parse_new_posts(response, username)
+
+    def _fetch_user_tweets(self, username: str) -> dict[str, Any]:
         if DEBUG:  # Mock response for debugging
-            with open("data/mock_x_user.json", "r", encoding="utf-8") as f:
-                response = json.load(f)
-        else:
-            response = requests.get(
-                self.BASE_USER_BY_SCREEN_NAME_URL,
-                headers={
-                    "Authorization": f"Bearer {BEARER_TOKEN}",
-                    "User-Agent": USER_AGENT,
-                    "X-CSRF-Token": self.csrf_token,
-                },
-                cookies={
-                    "auth_token": self.auth_token,
-                    "ct0": self.csrf_token,
-                },
-                params={
-                    "variables": json.dumps({"screenName": username}),
-                },
+            with span("fetch"):
+                with open("data/mock_x_user_tweets.json", "r", encoding="utf-8") as f:
+                    return json.load(f)
+
+        params = self._user_tweets_params(self.fetch_user_id(username))
+
+        with span("fetch"):
+            response = self.http.get(
+                self.BASE_USER_TWEETS_URL, headers=self._headers(), cookies=self._cookies(), params=params
             )
-            if response.status_code != 200:
-                return ""
+            response.raise_for_status()
 
-            response = response.json()
+            return response.json()
 
+    async def _fetch_user_tweets_async(self, username: str) -> dict[str, Any]:
+        if DEBUG:  # Mock response for debugging
+            with span("fetch"):
+                with open("data/mock_x_user_tweets.json", "r", encoding="utf-8") as f:
+                    return json.load(f)
+
+        params = self._user_tweets_params(await self.fetch_user_id_async(username))
+
+        with span("fetch"):
+            response = await self.async_http.get(
+                self.BASE_USER_TWEETS_URL, headers=self._headers(), cookies=self._cookies(), params=params
+            )
+            response.raise_for_status()
+
+            return response.json()
+
+    def _stream_user_tweets(self, username: str, after: Optional[int] = None) -> list[dict[str, Any]]:
+        """Read the timeline only until the first tweet not newer than `after` (or the newest tweet without it).
+
+        Returns the tweets read, newest first.
+        """
+
+        tweets: dict[str, dict[str, Any]] = {}
+
+        if DEBUG:  # Mock response for debugging
+            with span("fetch"), open("data/mock_x_user_tweets.json", "rb") as f:
+                for entry in iter_items(iter(lambda: f.read(STREAM_CHUNK_SIZE), b""), self.TIMELINE_ENTRIES_PATH):
+                    if self._collect_tweets(tweets, entry, after):
+                        break
+            return self._sort_tweets(tweets)
+
+        params = self._user_tweets_params(self.fetch_user_id(username))
+
+        with span("fetch"):
+            with self.http.stream(
+                self.BASE_USER_TWEETS_URL, headers=self._headers(), cookies=self._cookies(), params=params
+            ) as response:
+                response.raise_for_status()
+
+                for entry in iter_items(response.iter_content(STREAM_CHUNK_SIZE), self.TIMELINE_ENTRIES_PATH):
+                    if self._collect_tweets(tweets, entry, after):
+                        break
+
+        return self._sort_tweets(tweets)
+
+    async def _stream_user_tweets_async(self, username: str, after: Optional[int] = None) -> list[dict[str, Any]]:
+        tweets: dict[str, dict[str, Any]] = {}
+
+        if DEBUG:  # Mock response for debugging
+            with span("fetch"), open("data/mock_x_user_tweets.json", "rb") as f:
+                for entry in iter_items(iter(lambda: f.read(STREAM_CHUNK_SIZE), b""), self.TIMELINE_ENTRIES_PATH):
+                    if self._collect_tweets(tweets, entry, after):
+                        break
+            return self._sort_tweets(tweets)
+
+        params = self._user_tweets_params(await self.fetch_user_id_async(username))
+
+        with span("fetch"):
+            async with self.async_http.stream(
+                self.BASE_USER_TWEETS_URL, headers=self._headers(), cookies=self._cookies(), params=params
+            ) as response:
+                response.raise_for_status()
+
+                chunks = response.content.iter_chunked(STREAM_CHUNK_SIZE)
+                async for entry in aiter_items(chunks, self.TIMELINE_ENTRIES_PATH):
+                    if self._collect_tweets(tweets, entry, after):
+                        break
+
+        return self._sort_tweets(tweets)
+
+    def _collect_tweets(self, tweets: dict[str, dict[str, Any]], entry: dict[str, Any], after: Optional[int]) -> bool:
+        """Add the tweets of a timeline entry. Returns whether the entries that follow can only be older."""
+
+        entry_tweets = self._entry_tweets(entry)
+        for tweet in entry_tweets:
+            tweets[tweet["id_str"]] = tweet
+
+        if not entry_tweets:
+            return False
+
+        return after is None or max(int(tweet["id_str"]) for tweet in entry_tweets) <= after
+
+    def _headers(self) -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {BEARER_TOKEN}",
+            "User-Agent": USER_AGENT,
+            "X-CSRF-Token": self.csrf_token,
+        }
+
+    def _cookies(self) -> dict[str, str]:
+        return {
+            "auth_token": self.auth_token,
+            "ct0": self.csrf_token,
+        }
+
+    def _user_by_screen_name_params(self, username: str) -> dict[str, str]:
+        return {
+            "variables": json.dumps({"screenName": username}),
+        }
+
+    def _user_tweets_params(self, user_id: str) -> dict[str, str]:
+        return {
+            "variables": json.dumps(
+                {
+                    "userId": user_id,
+                    "count": self.USER_TWEETS_COUNT,
+                    "includePromotedContent": False,
+                    "withQuickPromoteEligibilityTweetFields": True,
+                    "withVoice": True,
+                    "withV2Timeline": True,
+                }
+            ),
+            "features": self.USER_TWEETS_FEATURES,
+            "fieldToggles": self.USER_TWEETS_FIELD_TOGGLES,
+        }
+
+    def _parse_user_id(self, response: dict[str, Any]) -> str:
         user_id = response.get("data", {}).get("user_result_by_screen_name", {}).get("id", "")
         return base64.b64decode(user_id).decode("utf-8").removeprefix("UserResults:")
 
-    def fetch_latest_post(self, username: str) -> Optional[Post]:
-        """Fetch the latest post from a user by user ID."""
+    def _parse_latest_post(self, response: dict[str, Any], username: str) -> Optional[Post]:
+        return self._latest_post(self._parse_tweets(response), username)
 
-        if DEBUG:  # Mock response for debugging
-            with open("data/mock_x_user_tweets.json", "r", encoding="utf-8") as f:
-                response = json.load(f)
-        else:
-            headers = {
-                "Authorization": f"Bearer {BEARER_TOKEN}",
-                "User-Agent": USER_AGENT,
-                "X-CSRF-Token": self.csrf_token,
-            }
-
-            cookies = {
-                "auth_token": self.auth_token,
-                "ct0": self.csrf_token,
-            }
-
-            params = {
-                "variables": json.dumps(
-                    {
-                        "userId": self.fetch_user_id(username),
-                        "count": 1,
-                        "includePromotedContent": False,
-                        "withQuickPromoteEligibilityTweetFields": True,
-                        "withVoice": True,
-                        "withV2Timeline": True,
-                    }
-                ),
-                "features": json.dumps(
-                    {
-                        "profile_label_improvements_pcf_label_in_post_enabled": True,
-                        "rweb_tipjar_consumption_enabled": True,
-                        "responsive_web_graphql_exclude_directive_enabled": True,
-                        "verified_phone_label_enabled": False,
-                        "creator_subscriptions_tweet_preview_api_enabled": True,
-                        "responsive_web_graphql_timeline_navigation_enabled": True,
-                        "responsive_web_graphql_skip_user_profile_image_extensions_enabled": False,
-                        "premium_content_api_read_enabled": False,
-                        "communities_web_enable_tweet_community_results_fetch": True,
-                        "c9s_tweet_anatomy_moderator_badge_enabled": True,
-                        "responsive_web_grok_analyze_button_fetch_trends_enabled": False,
-                        "responsive_web_grok_analyze_post_followups_enabled": True,
-                        "responsive_web_jetfuel_frame": False,
-                        "responsive_web_grok_share_attachment_enabled": True,
-                        "articles_preview_enabled": True,
-                        "responsive_web_edit_tweet_api_enabled": True,
-                        "graphql_is_translatable_rweb_tweet_is_translatable_enabled": True,
-                        "view_counts_everywhere_api_enabled": True,
-                        "longform_notetweets_consumption_enabled": True,
-                        "responsive_web_twitter_article_tweet_consumption_enabled": True,
-                        "tweet_awards_web_tipping_enabled": False,
-                        "responsive_web_grok_analysis_button_from_backend": True,
-                        "creator_subscriptions_quote_tweet_preview_enabled": False,
-                        "freedom_of_speech_not_reach_fetch_enabled": True,
-                        "standardized_nudges_misinfo": True,
-                        "tweet_with_visibility_results_prefer_gql_limited_actions_policy_enabled": True,
-                        "rweb_video_timestamps_enabled": True,
-                        "longform_notetweets_rich_text_read_enabled": True,
-                        "longform_notetweets_inline_media_enabled": True,
-                        "responsive_web_grok_image_annotation_enabled": False,
-                        "responsive_web_enhance_cards_enabled": False,
-                    }
-                ),
-                "fieldToggles": json.dumps(
-                    {
-                        "withArticlePlainText": False,
-                    }
-                ),
-            }
-
-            response = requests.get(self.BASE_USER_TWEETS_URL, headers=headers, cookies=cookies, params=params)
-            if response.status_code != 200:
-                return None
-
-            response = response.json()
-
-        latest_tweet = (
-            response.get("data", {})
-            .get("user", {})
-            .get("result", {})
-            .get("timeline_v2", {})
-            .get("timeline", {})
-            .get("instructions", [])[1]
-            .get("entries", [])[0]
-            .get("content", {})
-        )
+    def _parse_new_posts(self, response: dict[str, Any], username: str) -> list[Post]:
+        return self._new_posts(self._parse_tweets(response), username)
+
+    def _latest_post(self, tweets: list[dict[str, Any]], username: str) -> Optional[Post]:
+        if not tweets:
+            return None
+
+        return self._parse_post(tweets[0], username)
+
+    def _new_posts(self, tweets: list[dict[str, Any]], username: str) -> list[Post]:
+        if not tweets:
+            return []
+
+        last_seen_id = self.last_seen_ids.get(username)
+        self.last_seen_ids[username] = max(int(tweets[0]["id_str"]), last_seen_id or 0)
+
+        if last_seen_id is None:
+            return [self._parse_post(tweets[0], username)]
+
+        return [self._parse_post(tweet, username) for tweet in tweets if int(tweet["id_str"]) > last_seen_id]
+
+    def _parse_tweets(self, response: dict[str, Any]) -> list[dict[str, Any]]:
+        """Collect the tweets of a user timeline, newest first."""
+
+        tweets = {}
+        for instruction in TIMELINE_INSTRUCTIONS.get(response):
+            if instruction.get("type") == "TimelineAddEntries":
+                entries = instruction.get("entries", [])
+            elif instruction.get("type") == "TimelinePinEntry":
+                entries = [instruction.get("entry", {})]
+            else:
+                continue
+
+            for entry in entries:
+                for tweet in self._entry_tweets(entry):
+                    tweets[tweet["id_str"]] = tweet
+
+        return self._sort_tweets(tweets)
+
+    def _entry_tweets(self, entry: dict[str, Any]) -> list[dict[str, Any]]:
+        tweet = ITEM_TWEET.get(entry)
+        if tweet is not None:
+            return [tweet] if tweet.get("id_str") else []
+
+        return [tweet for result in MODULE_TWEETS.get(entry) if (tweet := TWEET.get(result)) and tweet.get("id_str")]
 
-        if "itemContent" not in latest_tweet:
-            latest_tweet = latest_tweet.get("items", [])[0].get("item", {})
+    @staticmethod
+    def _sort_tweets(tweets: dict[str, dict[str, Any]]) -> list[dict[str, Any]]:
+        return sorted(tweets.values(), key=lambda tweet: int(tweet["id_str"]), reverse=True)
 
-        latest_tweet = latest_tweet.get("itemContent", {}).get("tweet_results", {}).get("result", {}).get("legacy", {})
+    def _parse_post(self, tweet: dict[str, Any], username: str) -> Post:
+        fields = TWEET_POST.extract(tweet)
+        media_urls = fields["media_urls"]
 
         return Post(
             platform="X",
             author=username,
             author_url=f"https://x.com/{username}",
-            text=latest_tweet.get("full_text", ""),
-            url=latest_tweet.get("entities", {}).get("media", [{}])[0].get("url", ""),
-            media_url=latest_tweet.get("entities", {}).get("media", [{}])[0].get("media_url_https", None),
-            created_at=datetime.strptime(latest_tweet.get("created_at", ""), "%a %b %d %H:%M:%S %z %Y"),
-            raw_data=latest_tweet,
+            text=fields["text"],
+            url=fields["url"] or f"https://x.com/{username}/status/{fields['id']}",
+            media_url=media_urls[0] if media_urls else None,
+            media_urls=media_urls,
+            created_at=fields["created_at"],
+            raw_data=tweet,
         )
@@ -1,7 +1,50 @@
-from tui.app import CSGOCasesApp
+import signal
+import asyncio
+import argparse
+from typing import Optional
+
+
+async def run_headless(log_file: Optional[str] = None, verbose: bool = False) -> None:
+    """Run the bot without the Textual UI until SIGTERM or SIGINT."""
+
+    from settings import Settings
+    from pipeline import ConsoleLogger, PromocodeService
+
+    logger = ConsoleLogger(log_file, verbose=verbose)
+    service = PromocodeService(Settings.load(), logger=logger)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        if await service.check_login():
+            logger.info(f"Logged in as {service.bot.username}.")
+        else:
+            logger.warn("Not logged in to CSGOCases. Run the TUI once to log in; promocodes will not be claimed.")
+
+        await service.start()
+        logger.info("Headless bot started.")
+        await stop.wait()
+    finally:
+        logger.info("Shutting down...")
+        await service.stop()
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="CSGOCases promocode bot.")
+    parser.add_argument("--headless", action="store_true", help="run without the terminal UI")
+    parser.add_argument("--log-file", help="write headless logs to this file instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="include debug messages in headless logs")
+    args = parser.parse_args()
+
+    if args.headless:
+        asyncio.run(run_headless(args.log_file, verbose=args.verbose))
+        return
+
+    from tui.app import CSGOCasesApp
+
     app = CSGOCasesApp()
     app.run()
 
@@ -13,3 +13,9 @@ class Post:
     media_url: Optional[str]
     created_at: datetime
     raw_data: Optional[dict[str, Any]] = field(default_factory=dict, repr=False)
+    # Every image attached to the post; `media_url` is the first one
+    media_urls: list[str] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        if not self.media_urls and self.media_url:
+            self.media_urls = [self.media_url]
@@ -0,0 +1,7 @@
+from .fetcher import FetchJob, FetchResult, fetch
+from .pipeline import Candidate, PromocodePipeline, SourceState
+from .posting_model import PostingTimeModel
+from .breaker import CircuitBreaker
+from .scheduler import PollScheduler, SourceSchedule
+from .logger import ConsoleLogger, Logger
+from .service import PromocodeService, SOURCES
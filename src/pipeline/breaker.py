@@ -0,0 +1,65 @@
+from typing import Literal, Optional
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+
+@dataclass
+class CircuitBreaker:
+    """Stops polling a source that keeps failing, then probes it now and then until it recovers.
+
+    Closed: every poll goes through. After `failure_threshold` failures in a row the breaker opens and the
+    source isn't polled at all for `recovery_time` seconds. After that it is half-open: a single probe is let
+    through, which closes the breaker on success or opens it again for twice as long (up to
+    `max_recovery_time`) on failure.
+    """
+
+    failure_threshold: int = 5
+    recovery_time: float = 300.0
+    max_recovery_time: float = 3600.0
+
+    state: Literal["closed", "open", "half-open"] = "closed"
+    failures: int = 0  # In a row
+    total_failures: int = 0
+    trips: int = 0  # Openings since the source last recovered
+    opened_until: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+    def allow(self, now: datetime) -> bool:
+        """Check whether a poll may go through, turning an open breaker half-open once it has waited enough."""
+
+        if self.state == "open":
+            if self.opened_until is not None and now < self.opened_until:
+                return False
+            self.state = "half-open"
+
+        return True
+
+    def record_success(self) -> bool:
+        """Close the breaker. Returns whether the source just recovered from an open breaker."""
+
+        recovered = self.state != "closed"
+
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.opened_until = None
+        return recovered
+
+    def record_failure(self, now: datetime, error: Optional[str] = None) -> bool:
+        """Count a failure. Returns whether it (re)opened the breaker."""
+
+        self.failures += 1
+        self.total_failures += 1
+        self.last_error = error
+
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            self.trips += 1
+            self.state = "open"
+            recovery_time = min(self.max_recovery_time, self.recovery_time * 2 ** (self.trips - 1))
+            self.opened_until = now + timedelta(seconds=recovery_time)
+            return True
+
+        return False
+
+    def reset(self) -> None:
+        self.record_success()
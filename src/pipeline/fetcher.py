@@ -0,0 +1,59 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Optional, Union
+from dataclasses import dataclass, field
+
+from models import Post
+from integrations import PartialFetchError
+
+
+@dataclass
+class FetchJob:
+    platform: str
+    # Incremental sources return every post that is new since their previous poll
+    fetch: Callable[[], Awaitable[Union[Optional[Post], list[Post]]]] = field(repr=False)
+    timeout: float = 15.0
+
+
+@dataclass
+class FetchResult:
+    platform: str
+    posts: list[Post] = field(default_factory=list)
+    error: Optional[BaseException] = None
+    timed_out: bool = False
+    elapsed: float = 0.0
+
+    @property
+    def post(self) -> Optional[Post]:
+        """The newest fetched post, if any."""
+
+        return self.posts[0] if self.posts else None
+
+
+async def fetch(job: FetchJob) -> FetchResult:
+    """Run a fetch job, cancelling it after its timeout so a hanging source never holds up the caller.
+
+    Blocking integrations can be wrapped with `asyncio.to_thread`; in that case the worker thread is
+    abandoned rather than cancelled.
+    """
+
+    result = FetchResult(platform=job.platform)
+    start = time.monotonic()
+
+    try:
+        fetched = await asyncio.wait_for(job.fetch(), timeout=job.timeout)
+        if isinstance(fetched, list):
+            result.posts = fetched
+        elif fetched is not None:
+            result.posts = [fetched]
+    except TimeoutError:
+        result.timed_out = True
+    except PartialFetchError as e:
+        # The posts of the feeds that worked are still processed; the error fails the poll for the scheduler
+        result.posts = e.posts
+        result.error = e
+    except Exception as e:
+        result.error = e
+
+    result.elapsed = time.monotonic() - start
+    return result
@@ -0,0 +1,49 @@
+import sys
+import logging
+from typing import Optional, Protocol
+
+
+class Logger(Protocol):
+    """Anything the pipeline can report its progress to."""
+
+    def info(self, message: str) -> None: ...
+
+    def debug(self, message: str) -> None: ...
+
+    def warn(self, message: str) -> None: ...
+
+    def error(self, message: str) -> None: ...
+
+    def success(self, message: str) -> None: ...
+
+
+class ConsoleLogger:
+    """Logger for the headless daemon, writing timestamped lines to stdout or to a file."""
+
+    SUCCESS = 25
+
+    def __init__(self, path: Optional[str] = None, verbose: bool = False) -> None:
+        logging.addLevelName(self.SUCCESS, "SUCCESS")
+
+        handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)-8s - %(message)s", "%Y-%m-%d %H:%M:%S"))
+
+        self._logger = logging.getLogger("csgocases")
+        self._logger.handlers = [handler]
+        self._logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+        self._logger.propagate = False
+
+    def info(self, message: str) -> None:
+        self._logger.info(message)
+
+    def debug(self, message: str) -> None:
+        self._logger.debug(message)
+
+    def warn(self, message: str) -> None:
+        self._logger.warning(message)
+
+    def error(self, message: str) -> None:
+        self._logger.error(message)
+
+    def success(self, message: str) -> None:
+        self._logger.log(self.SUCCESS, message)
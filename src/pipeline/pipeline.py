@@ -0,0 +1,449 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+from dataclasses import dataclass, field
+from discord_webhook import DiscordWebhook, DiscordEmbed
+
+from models import Post
+from settings import Settings
+from integrations import CSGOCasesAPI, PartialFetchError
+from utils.ocr import OCRPool, load_code_area, parse_promocode
+from utils.ocrcache import OCRCache
+from utils.promocode import find_promocode
+from utils.http import HTTPClient
+from utils.metrics import LatencyTracker, Trace, current_trace, span
+from utils.ratelimit import RateLimitedError
+from repositories import PromocodeRepository
+from .fetcher import FetchJob, FetchResult, fetch
+from .logger import Logger
+
+
+@dataclass
+class Candidate:
+    """A post travelling through the pipeline, enriched by each stage."""
+
+    post: Post
+    promocode: Optional[str] = None
+    trace: Optional[Trace] = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.trace is None:
+            self.trace = Trace(self.post.platform)
+
+        self.trace.post_url = self.post.url
+        self.trace.created_at = self.post.created_at
+
+
+@dataclass
+class SourceState:
+    """What the pipeline remembers about a polled source between polls."""
+
+    fingerprint: Optional[int] = None  # Of the posts the last poll handed to the pipeline
+    polls: int = 0  # Successful polls
+    unchanged: int = 0  # Polls that returned the same posts as the previous one and were dropped right away
+
+
+Handler = Callable[[Candidate], Awaitable[Optional[Candidate]]]
+
+
+class PromocodePipeline:
+    """Queue-connected promocode pipeline: fetch → filter → text/OCR → redeem → notify.
+
+    Every stage runs on its own worker and hands candidates to the next one through a bounded queue, so a
+    slow stage (e.g. a Selenium claim) applies backpressure instead of blocking the stages before it, and
+    the first code found is claimed without waiting for the other platforms to be fetched.
+    """
+
+    # Failed posts kept for the next poll
+    MAX_RETRIES = 50
+
+    def __init__(
+        self,
+        settings: Settings,
+        promocode_repo: PromocodeRepository,
+        bot: CSGOCasesAPI,
+        logger: Logger,
+        queue_size: int = 8,
+        on_promocode: Optional[Callable[[Candidate], None]] = None,
+        metrics: Optional[LatencyTracker] = None,
+        http: Optional[HTTPClient] = None,
+        ocr: Optional[OCRPool] = None,
+        ocr_cache: Optional[OCRCache] = None,
+    ) -> None:
+        self.settings = settings
+        self.promocode_repo = promocode_repo
+        self.bot = bot
+        self.logger = logger
+        self.on_promocode = on_promocode
+        self.metrics = metrics or LatencyTracker()
+        self.http = http
+        self.ocr = ocr or OCRPool(workers=0)
+        self.ocr_cache = ocr_cache or OCRCache()
+
+        self.posts: asyncio.Queue[Candidate] = asyncio.Queue(queue_size)
+        self.candidates: asyncio.Queue[Candidate] = asyncio.Queue(queue_size)
+        self.promocodes: asyncio.Queue[Candidate] = asyncio.Queue(queue_size)
+        self.claimed: asyncio.Queue[Candidate] = asyncio.Queue(queue_size)
+
+        self.sources: dict[str, SourceState] = {}
+
+        self._in_flight: set[str] = set()
+        # Posts that failed after being handed to the pipeline, by URL, oldest first
+        self._retries: dict[str, Post] = {}
+        self._workers: list[asyncio.Task] = []
+        self._cross_checks: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start one worker per stage on the running event loop."""
+
+        if self._workers:
+            return
+
+        # OCR gets a worker per OCR process so posts from several platforms are read at the same time
+        stages: list[tuple[str, asyncio.Queue, Handler, Optional[asyncio.Queue], int]] = [
+            ("filter", self.posts, self._filter, self.candidates, 1),
+            ("ocr", self.candidates, self._ocr, self.promocodes, self.ocr.slots),
+            ("redeem", self.promocodes, self._redeem, self.claimed, 1),
+            ("notify", self.claimed, self._notify, None, 1),
+        ]
+
+        self._workers = [
+            asyncio.create_task(self._worker(name, inbox, handler, outbox), name=f"pipeline-{name}")
+            for name, inbox, handler, outbox, workers in stages
+            for _ in range(workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel all stage workers."""
+
+        tasks = [*self._workers, *self._cross_checks]
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+    async def produce(self, job: FetchJob) -> FetchResult:
+        """Fetch stage: run a single fetch job and submit its posts."""
+
+        trace = Trace(job.platform)
+        token = current_trace.set(trace)
+        try:
+            result = await fetch(job)
+        finally:
+            current_trace.reset(token)
+
+        if result.timed_out:
+            self.logger.warn(f"Scraping {result.platform} timed out after {result.elapsed:.1f}s. Skipping...")
+        elif isinstance(result.error, RateLimitedError):
+            self.logger.warn(f"{result.platform} is rate limited. Retrying in {result.error.retry_after:.0f}s...")
+        elif result.error is not None and not isinstance(result.error, PartialFetchError):
+            self.logger.error(f"Failed to scrape {result.platform}: {result.error}")
+        else:
+            if result.error is not None:
+                self.logger.error(f"Partially scraped {result.platform}: {result.error}")
+            else:
+                self.logger.debug(f"Scraped {result.platform} in {result.elapsed:.1f}s.")
+            await self._retry()
+            if self._unchanged(job.platform, result.posts):
+                self.logger.debug(f"Nothing new on {result.platform} since the last poll. Skipping...")
+            elif result.posts:
+                # Every post gets its own trace, sharing the timings of the poll that found it
+                for i, post in enumerate(result.posts):
+                    post_trace = trace
+                    if i > 0:
+                        post_trace = Trace(job.platform, started_at=trace.started_at, spans=dict(trace.spans))
+                    await self.submit(post, post_trace)
+                return result
+
+        await self._record(trace)
+        return result
+
+    async def _record(self, trace: Trace) -> None:
+        self.metrics.record(trace)
+        if not self.metrics.export_path:
+            return
+
+        try:
+            await asyncio.to_thread(self.metrics.export, trace)
+        except Exception as e:
+            # The export path is typed in the settings, so it can be a directory or unwritable for a while
+            self.logger.warn(f"{e}. Skipping...")
+
+    def _unchanged(self, source: str, posts: list[Post]) -> bool:
+        """Fingerprint the posts of a poll and check them against the previous poll of the same source.
+
+        Sources that only return their latest post return the same one over and over; this lets such polls
+        end right after parsing, without touching the database, the media or OCR.
+        """
+
+        state = self.sources.setdefault(source, SourceState())
+        state.polls += 1
+
+        if not posts:
+            return False
+
+        fingerprint = hash(tuple((post.url, post.text, tuple(post.media_urls)) for post in posts))
+        if fingerprint == state.fingerprint:
+            state.unchanged += 1
+            return True
+
+        state.fingerprint = fingerprint
+        return False
+
+    async def submit(self, post: Post, trace: Optional[Trace] = None) -> None:
+        """Enqueue a post for analysis, waiting while the pipeline is saturated."""
+
+        # The same post can be fetched again while a previous copy is still being claimed
+        if post.url in self._in_flight:
+            self.logger.debug(f"Post from {post.platform} is already being processed. Skipping...")
+            return
+
+        self._in_flight.add(post.url)
+        await self.posts.put(Candidate(post, trace=trace))
+
+    def _retry_later(self, post: Post) -> None:
+        """Submit a post again on the next successful poll.
+
+        Polls can't be relied on to bring it back: X and Discord only return posts newer than the last one
+        fetched, and the others drop a poll that returned the same posts as the previous one.
+        """
+
+        self._retries.pop(post.url, None)
+        self._retries[post.url] = post
+        while len(self._retries) > self.MAX_RETRIES:
+            del self._retries[next(iter(self._retries))]
+
+    async def _retry(self) -> None:
+        # Whatever the source of the poll, since Discord posts arrive over the gateway and aren't polled
+        retries, self._retries = self._retries, {}
+        for post in retries.values():
+            self.logger.debug(f"Retrying post from {post.platform}...")
+            await self.submit(post)
+
+    async def _worker(
+        self, name: str, inbox: asyncio.Queue, handler: Handler, outbox: Optional[asyncio.Queue]
+    ) -> None:
+        while True:
+            candidate = await inbox.get()
+            current_trace.set(candidate.trace)
+            try:
+                result = await handler(candidate)
+            except (Exception, asyncio.CancelledError) as e:
+                # Stopping the pipeline cancels the worker itself; anything else cancelled only fails this post
+                if isinstance(e, asyncio.CancelledError) and asyncio.current_task().cancelling():
+                    raise
+
+                self.logger.error(f"Pipeline stage '{name}' failed for post from {candidate.post.platform}: {e!r}")
+                result = None
+                self._retry_later(candidate.post)
+
+            if result is not None and outbox is not None:
+                await outbox.put(result)
+            else:
+                self._in_flight.discard(candidate.post.url)
+                await self._record(candidate.trace)
+
+            inbox.task_done()
+
+    async def _filter(self, candidate: Candidate) -> Optional[Candidate]:
+        post = candidate.post
+        self.logger.debug(f"Analyzing post from {post.platform}...")
+
+        if not post.media_url and not find_promocode(post.text):
+            self.logger.warn(f"No media found in post from {post.platform}. Skipping...")
+            return None
+
+        # Check if there is the word "promocode" in the post text
+        if post.text and "promocode" not in post.text.lower():
+            self.logger.debug(f"No promocode mentioned in post from {post.platform}. Skipping...")
+            return None
+
+        # Check if promocode already exists
+        with span("dedupe"):
+            exists = await asyncio.to_thread(self.promocode_repo.exists_by_post_url, post.url)
+
+        if exists:
+            self.logger.debug(f"Promocode from post on {post.platform} already claimed. Skipping...")
+            return None
+
+        candidate.trace.mark_since_published("publish_to_detect")
+        return candidate
+
+    async def _ocr(self, candidate: Candidate) -> Optional[Candidate]:
+        post = candidate.post
+
+        # A code written in the text saves downloading and reading the image
+        with span("text"):
+            promocode = find_promocode(post.text)
+
+        if promocode:
+            self.logger.debug(f"Promocode '{promocode}' found in the text of the post from {post.platform}.")
+            if post.media_urls:
+                # The image is still read, off the critical path, in case it shows a different code
+                task = asyncio.create_task(self._cross_check(post, promocode))
+                self._cross_checks.add(task)
+                task.add_done_callback(self._cross_checks.discard)
+        else:
+            with span("ocr"):
+                promocode = await self._read_images(post)
+
+        if not promocode:
+            self.logger.warn(f"No promocode found in post from {post.platform}.")
+            return None
+
+        return await self._accept(candidate, promocode)
+
+    async def _accept(self, candidate: Candidate, promocode: str) -> Optional[Candidate]:
+        post = candidate.post
+
+        # Check if promocode already exists by code
+        with span("dedupe"):
+            exists = await asyncio.to_thread(self.promocode_repo.exists_by_code, promocode)
+
+        if exists:
+            self.logger.info(f"Promocode '{promocode}' from post on {post.platform} already claimed. Skipping...")
+            return None
+
+        candidate.promocode = promocode
+        if self.on_promocode is not None:
+            self.on_promocode(candidate)
+
+        return candidate
+
+    async def _cross_check(self, post: Post, promocode: str) -> None:
+        """Read the images of a post whose text gave `promocode`, and claim the code they show if it differs."""
+
+        # The post's own trace is over by the time this is done
+        current_trace.set(None)
+
+        try:
+            read = await self._read_images(post)
+        except Exception as e:
+            self.logger.warn(f"Could not cross-check the promocode from {post.platform} against its image: {e}")
+            return
+
+        if not read or read == promocode:
+            return
+
+        self.logger.warn(
+            f"Promocode '{promocode}' in the text of the post from {post.platform} differs from '{read}' in its image."
+        )
+        candidate = await self._accept(Candidate(post), read)
+        if candidate is not None:
+            await self.promocodes.put(candidate)
+
+    async def _read_images(self, post: Post) -> str:
+        """The promocode on the images of a post (empty if there is none)."""
+
+        # Posts can carry several images; they are all read at once, but the promocode is usually on the first one
+        readings = [asyncio.create_task(self._read_promocode(media_url)) for media_url in post.media_urls]
+
+        try:
+            for reading in readings:
+                promocode = await reading
+                if promocode:
+                    return promocode
+            return ""
+        finally:
+            for reading in readings:
+                reading.cancel()
+            # Collect the leftovers so their errors aren't reported as never retrieved
+            await asyncio.gather(*readings, return_exceptions=True)
+
+    async def _read_promocode(self, media_url: str) -> str:
+        """Read the promocode on one image, going through the OCR cache first."""
+
+        # Taken once, so a setting changed halfway through doesn't file the result under the wrong profile
+        profile = self.ocr.profile
+        promocode = self.ocr_cache.lookup(media_url, profile)
+        if promocode is not None:
+            self.logger.debug(f"Image {media_url} was already read. Skipping download and OCR...")
+            return promocode
+
+        digest, promocode, image = await asyncio.to_thread(
+            load_code_area, media_url, self.http, self.ocr_cache, profile
+        )
+        if promocode is not None:
+            self.logger.debug(f"Image {media_url} was already read under another URL. Skipping OCR...")
+        else:
+            # Keyed by the bytes so the same image cross-posted under another URL is only read once
+            promocode = parse_promocode(await asyncio.wrap_future(self.ocr.submit(digest, image)))
+
+        if self.ocr_cache.put(media_url, digest, promocode, profile):
+            try:
+                await asyncio.to_thread(self.ocr_cache.save)
+            except IOError as e:
+                self.logger.warn(str(e))
+
+        return promocode
+
+    async def _redeem(self, candidate: Candidate) -> Optional[Candidate]:
+        post, promocode = candidate.post, candidate.promocode
+
+        if not self.settings.enable_auto_redeem:
+            return candidate
+
+        if not self.bot._is_logged_in:
+            self.logger.error(f"Bot is not logged in. Cannot claim promocode '{promocode}' until the next poll.")
+            self._retry_later(post)
+            return None
+
+        self.logger.info(f"Promocode '{promocode}' found in post from {post.platform}. Claiming...")
+        try:
+            with span("redeem"):
+                result = await asyncio.to_thread(self.bot.claim_promocode, promocode)
+            candidate.trace.mark_since_published("publish_to_claim")
+
+            if result.get("status") == "success":
+                self.logger.success(f"Promocode '{promocode}' claimed successfully: {result.get('message')}")
+            else:
+                self.logger.error(f"Failed to claim promocode '{promocode}': {result.get('message')}")
+            await asyncio.to_thread(self.promocode_repo.create, code=promocode, post_url=post.url)
+
+        except Exception as e:
+            self.logger.error(f"Failed to claim promocode '{promocode}': {e}. Retrying on the next poll...")
+            self._retry_later(post)
+            return None
+
+        return candidate
+
+    async def _notify(self, candidate: Candidate) -> None:
+        post, promocode = candidate.post, candidate.promocode
+
+        if not self.settings.send_notifications:
+            return None
+
+        webhook_url = self.settings.discord_webhook_url
+        if not webhook_url:
+            self.logger.warn("Discord webhook URL is not set. Cannot send notification.")
+            return None
+
+        self.logger.info(f"Sending notification for promocode '{promocode}'...")
+        try:
+            webhook = DiscordWebhook(url=webhook_url, content="@everyone")
+
+            embed = DiscordEmbed(
+                title=f"New promocode `{promocode}`",
+                description=f"Click [here]({post.url}) to see the post",
+                color="6dc176",
+            )
+            embed.set_author(name="csgocases.com", icon_url="https://csgocases.com/images/avatar.jpg", url=post.author_url)
+            if post.media_url:
+                embed.set_image(url=post.media_url)
+            embed.set_timestamp()
+
+            webhook.add_embed(embed)
+
+            with span("notify"):
+                response = await asyncio.to_thread(webhook.execute)
+            if response.ok:
+                self.logger.success(f"Notification for promocode '{promocode}' sent successfully.")
+            else:
+                self.logger.error(
+                    f"Failed to send notification for promocode '{promocode}': {response.status_code} {response.reason}"
+                )
+
+        except Exception as e:
+            self.logger.error(f"Failed to send notification for promocode '{promocode}': {e}")
+
+        return None
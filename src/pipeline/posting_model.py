@@ -0,0 +1,143 @@
+import json
+import threading
+from typing import Self, Iterable, Optional
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class PostingTimeModel:
+    """Learns when promocodes are posted, by day of week and hour of day (UTC).
+
+    Observations are binned into a 7x24 histogram, smoothed over neighbouring hours so a post at 14:58
+    also warms up 15:00, and turned into an interval multiplier for the poll scheduler: sources are polled
+    faster inside historically hot windows and slower outside them.
+    """
+
+    MODEL_PATH = "data/posting_model.json"
+
+    def __init__(
+        self,
+        min_observations: int = 10,
+        hot_threshold: float = 2.0,
+        hot_multiplier: float = 0.25,
+        cold_multiplier: float = 4.0,
+        prior: float = 0.1,
+        max_seen: int = 1000,
+    ) -> None:
+        self.min_observations = min_observations
+        self.hot_threshold = hot_threshold
+        self.hot_multiplier = hot_multiplier
+        self.cold_multiplier = cold_multiplier
+        self.prior = prior
+        self.max_seen = max_seen
+
+        self.counts = [[0.0] * 24 for _ in range(7)]
+        self.seen: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()  # Saving runs in a worker thread
+
+    @property
+    def total(self) -> float:
+        return sum(map(sum, self.counts))
+
+    @property
+    def trained(self) -> bool:
+        return self.total >= self.min_observations
+
+    @classmethod
+    def fit(cls, timestamps: Iterable[datetime], **kwargs) -> Self:
+        """Build a model from a history of posting times."""
+
+        model = cls(**kwargs)
+        for timestamp in timestamps:
+            model.observe(timestamp)
+        return model
+
+    def observe(self, timestamp: datetime, key: Optional[str] = None) -> bool:
+        """Record a posting time. Returns False if `key` (e.g. the post URL) was already observed."""
+
+        weekday, hour = self._bin(timestamp)
+
+        with self._lock:
+            if key is not None:
+                if key in self.seen:
+                    return False
+
+                self.seen[key] = None
+                while len(self.seen) > self.max_seen:
+                    self.seen.popitem(last=False)
+
+            self.counts[weekday][hour] += 1
+        return True
+
+    def intensity(self, when: datetime) -> float:
+        """Posting rate at `when` relative to the weekly average (1.0 = average)."""
+
+        if not self.total:
+            return 1.0
+
+        smoothed = self._smoothed()
+        mean = sum(map(sum, smoothed)) / (7 * 24)
+        weekday, hour = self._bin(when)
+        return smoothed[weekday][hour] / mean
+
+    def interval_multiplier(self, when: datetime) -> float:
+        """Factor to scale a source's poll interval by at `when`."""
+
+        if not self.trained:
+            return 1.0
+
+        intensity = self.intensity(when)
+        if intensity >= self.hot_threshold:
+            return self.hot_multiplier
+
+        return min(self.cold_multiplier, max(1.0, 1 / intensity))
+
+    def hot_windows(self) -> list[tuple[int, int]]:
+        """(weekday, hour) bins considered hot, hottest first. Weekday 0 is Monday."""
+
+        if not self.trained:
+            return []
+
+        smoothed = self._smoothed()
+        mean = sum(map(sum, smoothed)) / (7 * 24)
+        hot = [(day, hour) for day in range(7) for hour in range(24) if smoothed[day][hour] / mean >= self.hot_threshold]
+        return sorted(hot, key=lambda bin: smoothed[bin[0]][bin[1]], reverse=True)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Self:
+        model = cls()
+
+        try:
+            with open(path or cls.MODEL_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return model
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error decoding posting model file: {e}")
+
+        model.counts = data.get("counts", model.counts)
+        model.seen = OrderedDict.fromkeys(data.get("seen", []))
+        return model
+
+    def save(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            data = json.dumps({"counts": self.counts, "seen": list(self.seen)})
+
+        try:
+            with open(path or self.MODEL_PATH, "w", encoding="utf-8") as f:
+                f.write(data)
+        except Exception as e:
+            raise IOError(f"Error saving posting model file: {e}")
+
+    def _smoothed(self) -> list[list[float]]:
+        # Flatten the week so smoothing wraps from Sunday 23:00 to Monday 00:00
+        flat = [count for day in self.counts for count in day]
+        size = len(flat)
+        smoothed = [self.prior + 0.25 * flat[i - 1] + 0.5 * flat[i] + 0.25 * flat[(i + 1) % size] for i in range(size)]
+        return [smoothed[day * 24 : (day + 1) * 24] for day in range(7)]
+
+    @staticmethod
+    def _bin(timestamp: datetime) -> tuple[int, int]:
+        # Naive timestamps (Instagram, Facebook) are local time; aware ones (X, Discord) carry their offset
+        timestamp = timestamp.astimezone(timezone.utc)
+        return timestamp.weekday(), timestamp.hour
@@ -0,0 +1,216 @@
+import random
+import asyncio
+from typing import Awaitable, Callable, Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from utils.ratelimit import RateLimitedError
+from .breaker import CircuitBreaker
+from .fetcher import FetchResult
+from .posting_model import PostingTimeModel
+from .logger import Logger
+
+
+@dataclass
+class SourceSchedule:
+    """Polling cadence of a single source."""
+
+    platform: str
+    interval: float
+    jitter: float = 0.2
+    min_interval: float = 1.0
+    max_backoff: float = 3600.0
+    hit_speedup: float = 4.0
+    hit_duration: float = 600.0
+
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    boosted_until: Optional[datetime] = None
+    next_poll: datetime = field(default_factory=datetime.now)
+    polling: bool = False
+
+    @property
+    def failures(self) -> int:
+        """Failed polls in a row."""
+
+        return self.breaker.failures
+
+    @property
+    def backing_off(self) -> bool:
+        return self.failures > 0
+
+    def boosted(self, now: datetime) -> bool:
+        return self.boosted_until is not None and now < self.boosted_until
+
+    def delay(self, now: datetime, multiplier: float = 1.0) -> float:
+        """Seconds until the next poll, with the time-of-day multiplier, backoff, hit speed-up and jitter applied."""
+
+        interval = max(self.min_interval, self.interval * multiplier)
+
+        if self.failures:
+            interval = min(interval * 2**self.failures, max(interval, self.max_backoff))
+        elif self.boosted(now):
+            interval = max(self.min_interval, interval / self.hit_speedup)
+
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def reschedule(self, now: Optional[datetime] = None, multiplier: float = 1.0) -> None:
+        now = now or datetime.now()
+        self.next_poll = now + timedelta(seconds=self.delay(now, multiplier))
+
+    def record_success(self) -> bool:
+        """Returns whether the source just recovered from an open circuit breaker."""
+
+        return self.breaker.record_success()
+
+    def record_failure(self, now: Optional[datetime] = None, error: Optional[str] = None) -> bool:
+        """Returns whether the failure opened the circuit breaker."""
+
+        return self.breaker.record_failure(now or datetime.now(), error)
+
+    def record_hit(self, now: Optional[datetime] = None) -> None:
+        self.boosted_until = (now or datetime.now()) + timedelta(seconds=self.hit_duration)
+
+
+class PollScheduler:
+    """Polls every source on its own adaptive schedule.
+
+    Each source has its own base interval and jitter. Failed polls (errors, timeouts, non-200 responses)
+    back the source off exponentially, and a source that keeps failing is cut off by its circuit breaker
+    and only probed now and then until it recovers. A promocode hit temporarily speeds every source up since codes
+    are usually cross-posted. When a posting-time model is given, intervals shrink inside historically hot
+    windows and grow outside them.
+    """
+
+    def __init__(
+        self,
+        poll: Callable[[str], Awaitable[Optional[FetchResult]]],
+        logger: Logger,
+        posting_model: Optional[PostingTimeModel] = None,
+    ) -> None:
+        self.poll = poll
+        self.logger = logger
+        self.posting_model = posting_model
+        self.schedules: dict[str, SourceSchedule] = {}
+
+        self._wake: dict[str, asyncio.Event] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def add(self, schedule: SourceSchedule) -> None:
+        self.schedules[schedule.platform] = schedule
+        self._wake[schedule.platform] = asyncio.Event()
+
+    def start(self) -> None:
+        """Start one polling loop per source on the running event loop."""
+
+        if self._tasks:
+            return
+
+        # Every source is polled once right away, then follows its own schedule
+        now = datetime.now()
+        for schedule in self.schedules.values():
+            schedule.next_poll = now
+
+        self._tasks = [
+            asyncio.create_task(self._run(schedule), name=f"poll-{platform}")
+            for platform, schedule in self.schedules.items()
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def poll_now(self, platform: Optional[str] = None) -> None:
+        """Wake one source (or every source) up immediately."""
+
+        now = datetime.now()
+        for name, schedule in self.schedules.items():
+            if platform is None or name == platform:
+                schedule.next_poll = now
+                self._wake[name].set()
+
+    def restart(self) -> None:
+        """Reset backoff and circuit breakers and reschedule every source from now."""
+
+        now = datetime.now()
+        for platform, schedule in self.schedules.items():
+            schedule.breaker.reset()
+            schedule.reschedule(now, self.multiplier(now))
+            self._wake[platform].set()  # Let the loop pick up the new deadline
+
+    def record_hit(self) -> None:
+        now = datetime.now()
+        for schedule in self.schedules.values():
+            schedule.record_hit(now)
+            # Pull the next poll forward if the boosted cadence would be sooner
+            sooner = now + timedelta(seconds=schedule.delay(now, self.multiplier(now)))
+            if sooner < schedule.next_poll:
+                schedule.next_poll = sooner
+                self._wake[schedule.platform].set()
+
+    async def _run(self, schedule: SourceSchedule) -> None:
+        wake = self._wake[schedule.platform]
+
+        while True:
+            delay = (schedule.next_poll - datetime.now()).total_seconds()
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=max(0.0, delay))
+            except TimeoutError:
+                pass
+
+            wake.clear()
+
+            # Woken up early because the deadline moved; wait for the new one instead
+            if schedule.next_poll > datetime.now():
+                continue
+
+            breaker = schedule.breaker
+            if not breaker.allow(datetime.now()):
+                schedule.next_poll = breaker.opened_until
+                continue
+
+            schedule.polling = True
+            try:
+                result = await self.poll(schedule.platform)
+            except Exception as e:
+                self.logger.error(f"Polling {schedule.platform} failed: {e}")
+                result = None
+                self._record_failure(schedule, repr(e))
+            finally:
+                schedule.polling = False
+
+            throttled_for = 0.0
+            if result is not None:
+                if isinstance(result.error, RateLimitedError):
+                    # The server said when to come back, so there is nothing to guess with backoff
+                    throttled_for = result.error.retry_after
+                elif result.timed_out:
+                    self._record_failure(schedule, "timed out")
+                elif result.error is not None:
+                    self._record_failure(schedule, repr(result.error))
+                elif schedule.record_success():
+                    self.logger.info(f"{schedule.platform} has recovered. Polling it again.")
+
+            now = datetime.now()
+            schedule.reschedule(now, self.multiplier(now))
+            schedule.next_poll = max(schedule.next_poll, now + timedelta(seconds=throttled_for))
+            if breaker.state == "open":
+                schedule.next_poll = max(schedule.next_poll, breaker.opened_until)
+
+    def _record_failure(self, schedule: SourceSchedule, error: str) -> None:
+        if not schedule.record_failure(error=error):
+            self.logger.debug(f"Backing off {schedule.platform} after {schedule.failures} failed poll(s).")
+            return
+
+        pause = (schedule.breaker.opened_until - datetime.now()).total_seconds()
+        self.logger.warn(f"{schedule.platform} failed {schedule.failures} poll(s) in a row. Pausing it for {pause:.0f}s...")
+
+    def multiplier(self, now: datetime) -> float:
+        """Interval multiplier suggested by the posting-time model for `now`."""
+
+        if self.posting_model is None:
+            return 1.0
+
+        return self.posting_model.interval_multiplier(now)
@@ -0,0 +1,252 @@
+import time
+import asyncio
+from typing import Any, Coroutine, Optional
+
+from models import Post
+from settings import Settings
+from utils.http import AsyncHTTPClient, HTTPClient
+from utils.metrics import LatencyTracker
+from utils.ocr import OCRPool
+from utils.ocrcache import OCRCache
+from utils.ratelimit import RateLimiter
+from repositories import PromocodeRepository
+from integrations import CSGOCasesAPI, FacebookAPI, XTwitterAPI, DiscordAPI, DiscordGateway, InstagramAPI
+from .fetcher import FetchJob, FetchResult
+from .pipeline import Candidate, PromocodePipeline
+from .posting_model import PostingTimeModel
+from .scheduler import PollScheduler, SourceSchedule
+from .logger import Logger
+
+from config import X_USERNAME, DISCORD_CHANNELS, INSTAGRAM_USERNAME, FACEBOOK_USERNAME
+
+# Platform name -> settings key prefix (`enable_<key>_scraper`, `<key>_poll_interval`)
+SOURCES = {"Discord": "discord", "X": "x", "Instagram": "instagram", "Facebook": "facebook"}
+
+
+class PromocodeService:
+    """The whole detect → OCR → redeem → notify bot, independent of any user interface.
+
+    Both the Textual app and the headless daemon build one of these and attach their own logger to it.
+    """
+
+    def __init__(self, settings: Settings, logger: Logger) -> None:
+        self.settings = settings
+        self.logger = logger
+
+        self.bot = CSGOCasesAPI()
+        self.promocode_repo = PromocodeRepository(settings.database_url)
+
+        # Long-lived clients so every poll reuses pooled keep-alive connections, paced by the limits the
+        # platforms report in their response headers
+        self.rate_limiter = RateLimiter()
+        http_options = {"timeout": settings.http_timeout, "retries": settings.http_retries, "limiter": self.rate_limiter}
+        self.http = HTTPClient(**http_options)
+        self.async_http = AsyncHTTPClient(**http_options)
+
+        clients = {"http": self.http, "async_http": self.async_http}
+        self.x_api = XTwitterAPI(
+            auth_token=settings.x_auth_token, csrf_token=settings.x_csrf_token, logger=logger, **clients
+        )
+        self.discord_api = DiscordAPI(auth_token=settings.discord_auth_token, logger=logger, **clients)
+        self.facebook_api = FacebookAPI(**clients)
+        self.instagram_api = InstagramAPI(**clients)
+
+        # Worker processes keep OCR off the event loop and the UI; their models are loaded in the background
+        # at startup instead of on the first image
+        self.ocr = OCRPool(workers=max(0, settings.ocr_workers))
+        if not self.ocr.configure(settings.ocr_device):
+            logger.warn(f"Invalid OCR device '{settings.ocr_device}'. Using the CPU.")
+
+        # What was already read from each image, so cross-posts and restarts don't go through OCR again
+        try:
+            self.ocr_cache = OCRCache.load()
+        except ValueError as e:
+            logger.warn(f"{e}. Starting with an empty OCR cache.")
+            self.ocr_cache = OCRCache()
+
+        self.pipeline = PromocodePipeline(
+            settings,
+            self.promocode_repo,
+            self.bot,
+            logger=logger,
+            on_promocode=self.on_promocode,
+            metrics=LatencyTracker(export_path=settings.metrics_export_path or None),
+            http=self.http,
+            ocr=self.ocr,
+            ocr_cache=self.ocr_cache,
+        )
+
+        # Pushes Discord messages in real time; the Discord poller only runs while it is disconnected
+        self.discord_gateway = DiscordGateway(
+            self.discord_api, DISCORD_CHANNELS, on_post=self.on_discord_message, logger=logger
+        )
+
+        try:
+            self.posting_model = PostingTimeModel.load()
+        except ValueError as e:
+            logger.warn(f"{e}. Starting with an empty posting model.")
+            self.posting_model = PostingTimeModel()
+        self.scheduler = PollScheduler(
+            self.poll,
+            logger=logger,
+            posting_model=self.posting_model if settings.enable_posting_model else None,
+        )
+        for platform, key in SOURCES.items():
+            self.scheduler.add(SourceSchedule(platform, interval=getattr(settings, f"{key}_poll_interval")))
+
+        # Background jobs of the service itself (model training and saving, OCR warm-up)
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Start the pipeline workers and the pollers on the running event loop."""
+
+        self.pipeline.start()
+        self.scheduler.start()
+        if self.settings.enable_discord_gateway:
+            self.discord_gateway.start()
+        self._spawn(self.train_posting_model())
+        self._spawn(self.warm_up_ocr())
+
+    async def stop(self) -> None:
+        """Stop polling, cancel the pipeline workers and quit the Chrome driver."""
+
+        await self.discord_gateway.stop()
+        await self.scheduler.stop()
+        await self.pipeline.stop()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.to_thread(self.bot.quit)
+        self.ocr.close()
+        self.http.close()
+        await self.async_http.close()
+
+    def apply_settings(self) -> None:
+        """Push edited settings into the long-lived components that cache them."""
+
+        settings = self.settings
+
+        self.promocode_repo.url = settings.database_url
+
+        self.x_api.auth_token = settings.x_auth_token
+        self.x_api.csrf_token = settings.x_csrf_token
+        self.discord_api.auth_token = settings.discord_auth_token
+        self.http.configure(timeout=settings.http_timeout)
+        self.async_http.configure(timeout=settings.http_timeout)
+
+        for platform, key in SOURCES.items():
+            self.scheduler.schedules[platform].interval = getattr(settings, f"{key}_poll_interval")
+
+        self.scheduler.posting_model = self.posting_model if settings.enable_posting_model else None
+        self.pipeline.metrics.export_path = settings.metrics_export_path or None
+        # Takes effect on the next image; half-typed device names are ignored
+        self.ocr.configure(settings.ocr_device)
+
+        if settings.enable_discord_gateway and not self.discord_gateway.running:
+            self.discord_gateway.start()
+        elif not settings.enable_discord_gateway and self.discord_gateway.running:
+            self._spawn(self.discord_gateway.stop())
+
+    async def check_login(self) -> bool:
+        """Check (in a worker thread) whether the CSGOCases session cookies are still valid."""
+
+        return await asyncio.to_thread(self.bot.is_logged_in)
+
+    def on_promocode(self, candidate: Candidate) -> None:
+        """Called by the pipeline whenever a new promocode is read from a post."""
+
+        self.scheduler.record_hit()
+
+        if self.posting_model.observe(candidate.post.created_at, key=candidate.post.url):
+            self._spawn(self.save_posting_model())
+
+    async def on_discord_message(self, post: Post) -> None:
+        """Called by the Discord gateway for every new message in a watched channel."""
+
+        if self.is_enabled("Discord"):
+            await self.pipeline.submit(post)
+
+    async def warm_up_ocr(self) -> None:
+        """Start the OCR workers and load their models so the first promocode doesn't wait for them."""
+
+        start = time.monotonic()
+        try:
+            await asyncio.to_thread(self.ocr.warm_up)
+        except Exception as e:
+            self.logger.error(f"Failed to load the OCR model on {self.ocr.device}: {e}")
+            return
+
+        where = f"{self.ocr.workers} worker process(es)" if self.ocr.workers else "the bot's process"
+        self.logger.info(f"OCR model loaded on {self.ocr.device} in {where} in {time.monotonic() - start:.1f}s.")
+
+    async def train_posting_model(self) -> None:
+        """Teach the posting-time model about promocodes claimed in previous runs."""
+
+        try:
+            rows = await asyncio.to_thread(self.promocode_repo.list_claim_times)
+        except Exception as e:
+            self.logger.warn(f"Could not load promocode history for the posting-time model: {e}")
+            return
+
+        # Rows only carry the time a code was stored, not when its post was published; codes are claimed
+        # seconds after they are posted, so that lands in the same hourly bin, which smoothing blurs anyway
+        learned = sum(self.posting_model.observe(created_at, key=post_url) for post_url, created_at in rows)
+        if learned:
+            await self.save_posting_model()
+
+        self.logger.info(f"Posting-time model trained on {len(self.posting_model.seen)} promocode post(s).")
+
+    async def save_posting_model(self) -> None:
+        try:
+            await asyncio.to_thread(self.posting_model.save)
+        except IOError as e:
+            self.logger.warn(f"{e}. The posting-time model will be saved again on the next promocode.")
+
+    def _spawn(self, coroutine: Coroutine[Any, Any, None]) -> None:
+        # The event loop only keeps weak references to tasks, so running ones are kept here
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def is_enabled(self, platform: str) -> bool:
+        """Check whether the scraper for a platform is enabled."""
+
+        return getattr(self.settings, f"enable_{SOURCES[platform]}_scraper")
+
+    def is_live(self, platform: str) -> bool:
+        """Check whether a platform is pushed in real time, making its poller redundant."""
+
+        return platform == "Discord" and self.is_enabled(platform) and self.discord_gateway.connected
+
+    async def poll(self, platform: str) -> Optional[FetchResult]:
+        """Poll a single source, feeding its new posts into the pipeline."""
+
+        job = self.fetch_job(platform)
+        if job is None:
+            return None
+
+        return await self.pipeline.produce(job)
+
+    def fetch_job(self, platform: str) -> Optional[FetchJob]:
+        """Build the fetch job for a platform, or None if its scraper is disabled."""
+
+        if not self.is_enabled(platform) or self.is_live(platform):
+            return None
+
+        timeout = self.settings.fetch_timeout
+
+        if platform == "X":
+            return FetchJob("X", lambda: self.x_api.fetch_new_posts_async(X_USERNAME), timeout)
+
+        if platform == "Discord":
+            return FetchJob("Discord", lambda: self.discord_api.fetch_new_posts_async(DISCORD_CHANNELS), timeout)
+
+        if platform == "Facebook":
+            return FetchJob("Facebook", lambda: self.facebook_api.fetch_latest_post_async(FACEBOOK_USERNAME), timeout)
+
+        if platform == "Instagram":
+            return FetchJob(
+                "Instagram", lambda: self.instagram_api.fetch_latest_post_async(INSTAGRAM_USERNAME), timeout
+            )
+
+        return None
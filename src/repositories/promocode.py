@@ -1,5 +1,6 @@
 import re
 import psycopg2
+from datetime import datetime
 
 
 class PromocodeRepository:
@@ -88,3 +89,20 @@ class PromocodeRepository:
                 cursor.execute(select_query, (code,))
                 exists = cursor.fetchone()[0]
         return exists
+
+    def list_claim_times(self) -> list[tuple[str, datetime]]:
+        """List the post URL and creation time of every stored promocode.
+
+        The creation time is when the code was claimed and stored, not when its post was published; the
+        table doesn't keep the latter.
+        """
+
+        with self.connect() as conn:
+            with conn.cursor() as cursor:
+                select_query = """
+                SELECT post_url, created_at FROM promocodes
+                """
+
+                cursor.execute(select_query)
+                rows = cursor.fetchall()
+        return rows
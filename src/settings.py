@@ -13,7 +13,18 @@ class Settings:
     discord_auth_token: str = ""
     discord_webhook_url: str = ""
     enable_auto_redeem: bool = True
-    scrape_interval: int = 30
+    fetch_timeout: int = 15
+    http_timeout: int = 10
+    http_retries: int = 2
+    discord_poll_interval: int = 5
+    x_poll_interval: int = 60
+    instagram_poll_interval: int = 120
+    facebook_poll_interval: int = 600
+    enable_posting_model: bool = True
+    enable_discord_gateway: bool = True
+    metrics_export_path: str = ""
+    ocr_device: str = "cpu"
+    ocr_workers: int = 2
     enable_discord_scraper: bool = True
     enable_instagram_scraper: bool = True
     enable_x_scraper: bool = True
@@ -27,7 +38,8 @@ class Settings:
         try:
             with open(cls.SETTINGS_PATH, "r") as f:
                 settings = json.load(f)
-            return cls(**settings)
+            # Ignore keys from older versions (e.g. the removed global scrape interval)
+            return cls(**{key: value for key, value in settings.items() if key in cls.__dataclass_fields__})
         except FileNotFoundError:
             return cls()
         except json.JSONDecodeError as e:
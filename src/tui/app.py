@@ -1,19 +1,12 @@
-import asyncio
 from textual.theme import Theme
 from textual.widgets import RichLog
 from textual.binding import Binding
-from datetime import datetime, timedelta
+from datetime import datetime
 from textual.app import App, ComposeResult
-from discord_webhook import DiscordWebhook, DiscordEmbed
 
-from models.post import Post
-from utils.ocr import read_promocode_from_image_url
-from repositories.promocode import PromocodeRepository
-from integrations import CSGOCasesAPI, FacebookAPI, XTwitterAPI, DiscordAPI, InstagramAPI
+from settings import Settings
+from pipeline import PromocodeService
 from .components import AppFooter, AppHeader, AppBody
-from .settings import Settings
-
-from config import X_USERNAME, DISCORD_CHANNEL_ID, DISCORD_GUILD_ID, INSTAGRAM_USERNAME, FACEBOOK_USERNAME
 
 
 class CSGOCasesApp(App):
@@ -34,7 +27,7 @@ class CSGOCasesApp(App):
             key="ctrl+s",
             action="force_scrape",
             description="Force Scrape",
-            tooltip="Force a promocode scrape.",
+            tooltip="Poll every source right now.",
             priority=True,
             id="force-scrape",
         ),
@@ -42,7 +35,7 @@ class CSGOCasesApp(App):
             key="ctrl+r",
             action="restart_countdown",
             description="Restart Countdown",
-            tooltip="Restart the scrape countdown timer.",
+            tooltip="Reset backoff and restart every source's poll timer.",
             priority=True,
             id="restart-countdown",
         ),
@@ -55,12 +48,11 @@ class CSGOCasesApp(App):
     }
     """
 
-    scraping = False
     settings = Settings.load()
-    next_scrape = datetime.now() + timedelta(minutes=settings.scrape_interval)
 
-    bot = CSGOCasesAPI()
-    promocode_repo = PromocodeRepository(settings.database_url)
+    def __init__(self) -> None:
+        super().__init__()
+        self.service = PromocodeService(self.settings, logger=self)
 
     def on_mount(self) -> None:
         self.register_theme(
@@ -85,152 +77,36 @@ class CSGOCasesApp(App):
     def on_ready(self) -> None:
         """Called when the app is ready."""
 
+        self.run_worker(self.start_service(), name="start-service")
+
+    async def start_service(self) -> None:
+        """Check the login, then start polling.
+
+        A promocode found before the login check is over couldn't be claimed, so the pollers wait for it,
+        like in headless mode.
+        """
+
+        await self.query_one(AppHeader).check_login()
+        await self.service.start()
         self.info("Application started.")
 
-    def on_shutdown(self) -> None:
+    async def on_shutdown(self) -> None:
         """Called when the app is shutting down."""
 
         self.info("Shutting down application...")
-        self.bot.quit()
+        await self.service.stop()
 
     def action_restart_countdown(self) -> None:
-        """Restart the scrape countdown timer."""
+        """Restart every source's poll timer."""
 
-        self.next_scrape = datetime.now() + timedelta(minutes=self.settings.scrape_interval)
-        self.info("Scrape countdown timer restarted.")
+        self.service.scheduler.restart()
+        self.info("Poll timers restarted.")
 
     def action_force_scrape(self) -> None:
-        """Force a promocode scrape."""
-
-        if self.scraping:
-            self.warn("A scrape is already in progress. Please wait...")
-            return
+        """Poll every enabled source right now."""
 
         self.info("Forcing promocode scrape...")
-
-        try:
-            asyncio.create_task(asyncio.to_thread(self.scrape))
-        finally:
-            self.next_scrape = datetime.now() + timedelta(minutes=self.settings.scrape_interval)
-
-    def scrape(self) -> None:
-        """Perform a promocode scrape."""
-
-        self.scraping = True
-        self.info("Starting promocode scrape...")
-
-        posts: list[Post] = []
-
-        if self.settings.enable_x_scraper:
-            self.info("Scraping X (Twitter)...")
-            posts.append(
-                XTwitterAPI(
-                    auth_token=self.settings.x_auth_token,
-                    csrf_token=self.settings.x_csrf_token,
-                ).fetch_latest_post(X_USERNAME)
-            )
-
-        if self.settings.enable_discord_scraper:
-            self.info("Scraping Discord...")
-            posts.append(
-                DiscordAPI(
-                    auth_token=self.settings.discord_auth_token,
-                ).fetch_latest_post(DISCORD_GUILD_ID, DISCORD_CHANNEL_ID)
-            )
-
-        if self.settings.enable_facebook_scraper:
-            self.info("Scraping Facebook...")
-            posts.append(FacebookAPI().fetch_latest_post(FACEBOOK_USERNAME))
-
-        if self.settings.enable_instagram_scraper:
-            self.info("Scraping Instagram...")
-            posts.append(InstagramAPI().fetch_latest_post(INSTAGRAM_USERNAME))
-
-        self.info("Analyzing posts...")
-        for post in posts:
-            if post is None:
-                continue
-
-            self.debug(f"Analyzing post from {post.platform}...")
-            if not post.media_url:
-                self.warn(f"No media found in post from {post.platform}. Skipping...")
-                continue
-
-            # Check if there is the word "promocode" in the post text
-            if post.text and "promocode" not in post.text.lower():
-                self.info(f"No promocode mentioned in post from {post.platform}. Skipping...")
-                continue
-
-            # Check if promocode already exists
-            if self.promocode_repo.exists_by_post_url(post.url):
-                self.info(f"Promocode from post on {post.platform} already claimed. Skipping...")
-                continue
-
-            promocode = read_promocode_from_image_url(post.media_url)
-            if not promocode:
-                self.warn(f"No promocode found in post from {post.platform}.")
-                continue
-
-            # Check if promocode already exists by code
-            if self.promocode_repo.exists_by_code(promocode):
-                self.info(f"Promocode '{promocode}' from post on {post.platform} already claimed. Skipping...")
-                continue
-
-            # Redeem promocode if auto-redeem is enabled
-            if self.settings.enable_auto_redeem:
-                if not self.bot._is_logged_in:
-                    self.error("Bot is not logged in. Cannot claim promocode.")
-                    continue
-
-                self.info(f"Promocode '{promocode}' found in post from {post.platform}. Claiming...")
-                try:
-                    result = self.bot.claim_promocode(promocode)
-                    if result.get("status") == "success":
-                        self.success(f"Promocode '{promocode}' claimed successfully: {result.get('message')}")
-                    else:
-                        self.error(f"Failed to claim promocode '{promocode}': {result.get('message')}")
-                    self.promocode_repo.create(code=promocode, post_url=post.url)
-
-                except Exception as e:
-                    self.error(f"Failed to claim promocode '{promocode}': {e}")
-
-            # Notify via Discord if enabled
-            if self.settings.send_notifications:
-                webhook_url = self.settings.discord_webhook_url
-                if not webhook_url:
-                    self.warn("Discord webhook URL is not set. Cannot send notification.")
-                    continue
-
-                self.info(f"Sending notification for promocode '{promocode}'...")
-                try:
-                    webhook = DiscordWebhook(url=webhook_url, content="@everyone")
-
-                    embed = DiscordEmbed(
-                        title=f"New promocode `{promocode}`",
-                        description=f"Click [here]({post.url}) to see the post",
-                        color="6dc176",
-                    )
-                    embed.set_author(
-                        name="csgocases.com", icon_url="https://csgocases.com/images/avatar.jpg", url=post.author_url
-                    )
-                    embed.set_image(url=post.media_url)
-                    embed.set_timestamp()
-
-                    webhook.add_embed(embed)
-
-                    response = webhook.execute()
-                    if response.ok:
-                        self.success(f"Notification for promocode '{promocode}' sent successfully.")
-                    else:
-                        self.error(
-                            f"Failed to send notification for promocode '{promocode}': {response.status_code} {response.reason}"
-                        )
-
-                except Exception as e:
-                    self.error(f"Failed to send notification for promocode '{promocode}': {e}")
-
-        self.info("Promocode scrape completed.")
-        self.scraping = False
+        self.service.scheduler.poll_now()
 
     def info(self, message: str) -> None:
         """Log an info message to the RichLog widget."""
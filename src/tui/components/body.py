@@ -1,9 +1,21 @@
 from textual.app import ComposeResult
 from textual.containers import Vertical, Horizontal
-from textual.widgets import RichLog, TabbedContent, TabPane, Static, Label, Input, Checkbox, MarkdownViewer
+from textual.widgets import (
+    RichLog,
+    TabbedContent,
+    TabPane,
+    Static,
+    Label,
+    Input,
+    Checkbox,
+    MarkdownViewer,
+    DataTable,
+)
 
 from textual.containers import Vertical
 
+from pipeline import SOURCES
+
 
 class AppBody(Vertical):
     """Main Body Container for the Application."""
@@ -23,6 +35,22 @@ class AppBody(Vertical):
         }
     }
 
+    #metrics-tab {
+        height: 1fr;
+        border: $secondary round;
+        padding-left: 1;
+
+        DataTable {
+            scrollbar-size: 0 1;
+        }
+
+        #sources-table, #ratelimit-table {
+            height: auto;
+            max-height: 10;
+            margin-top: 1;
+        }
+    }
+
     #help-viewer {
         scrollbar-size: 0 1;
     }
@@ -33,7 +61,7 @@ class AppBody(Vertical):
         height: 1fr;
     }
 
-    #scrape_interval {
+    .number {
         margin-left: 1;
     }
 
@@ -47,6 +75,11 @@ class AppBody(Vertical):
             with TabPane("Logs", id="logs-tab"):
                 yield RichLog(highlight=True, markup=True, wrap=True, max_lines=1000)
 
+            with TabPane("Metrics", id="metrics-tab"):
+                yield DataTable(id="metrics-table", cursor_type="row", zebra_stripes=True)
+                yield DataTable(id="sources-table", cursor_type="row", zebra_stripes=True)
+                yield DataTable(id="ratelimit-table", cursor_type="row", zebra_stripes=True)
+
             with TabPane("Settings", id="settings-tab"):
                 settings = self.app.settings
 
@@ -129,6 +162,20 @@ class AppBody(Vertical):
                             id="enable_facebook_scraper",
                         )
 
+                        yield Static()
+                        yield Checkbox(
+                            label="Real-time Discord Gateway",
+                            value=settings.enable_discord_gateway,
+                            compact=True,
+                            id="enable_discord_gateway",
+                        )
+                        yield Checkbox(
+                            label="Adapt Polling to Posting Times",
+                            value=settings.enable_posting_model,
+                            compact=True,
+                            id="enable_posting_model",
+                        )
+
                         yield Static()
                         yield Checkbox(
                             label="Send Notifications to Discord",
@@ -148,13 +195,66 @@ class AppBody(Vertical):
                         )
 
                         yield Static()
+                        yield Label("Metrics Export File (JSON lines):")
+                        yield Input(
+                            placeholder="e.g., data/metrics.jsonl",
+                            compact=True,
+                            id="metrics_export_path",
+                            value=settings.metrics_export_path,
+                        )
+
+                        yield Static()
+                        yield Label("OCR Device (cpu, cuda, cuda:N or mps):")
+                        yield Input(
+                            placeholder="e.g., cpu",
+                            compact=True,
+                            id="ocr_device",
+                            value=settings.ocr_device,
+                        )
+
+                        yield Static()
+                        for platform, key in SOURCES.items():
+                            with Horizontal():
+                                yield Label(f"{platform} Poll Interval (seconds):")
+                                yield Input(
+                                    placeholder="e.g., 60",
+                                    compact=True,
+                                    id=f"{key}_poll_interval",
+                                    classes="number",
+                                    value=str(getattr(settings, f"{key}_poll_interval")),
+                                    type="integer",
+                                )
+
+                        with Horizontal():
+                            yield Label("OCR Worker Processes (restart to apply):")
+                            yield Input(
+                                placeholder="e.g., 2",
+                                compact=True,
+                                id="ocr_workers",
+                                classes="number",
+                                value=str(settings.ocr_workers),
+                                type="integer",
+                            )
+
                         with Horizontal():
-                            yield Label("Scrape Interval (minutes):")
+                            yield Label("Fetch Timeout (seconds):")
                             yield Input(
                                 placeholder="e.g., 15",
                                 compact=True,
-                                id="scrape_interval",
-                                value=str(settings.scrape_interval),
+                                id="fetch_timeout",
+                                classes="number",
+                                value=str(settings.fetch_timeout),
+                                type="integer",
+                            )
+
+                        with Horizontal():
+                            yield Label("HTTP Timeout (seconds):")
+                            yield Input(
+                                placeholder="e.g., 10",
+                                compact=True,
+                                id="http_timeout",
+                                classes="number",
+                                value=str(settings.http_timeout),
                                 type="integer",
                             )
 
@@ -169,8 +269,16 @@ class AppBody(Vertical):
                 ## Configuration
                 - **Database URL**: The connection string for your database.
                 - **Authentication Tokens**: Required tokens for accessing social media APIs.
+                - **Metrics Export File**: When set, the per-stage timings of every processed post are appended to this file as JSON lines.
+                - **OCR Device**: Where the OCR model runs, `cpu` by default. Use `cuda` (or `cuda:1` for the second card) for an NVIDIA GPU and `mps` for Apple silicon. The model is loaded in the background at startup and reloaded on the next image after a change.
+                - **OCR Worker Processes**: OCR runs in this many separate processes, each with its own copy of the model (a few hundred MB of memory each), so it never slows down the interface and images from several posts are read in parallel. `0` runs it inside the bot instead. Takes effect after a restart.
                 - **Bot Settings**: Options to enable/disable auto-redeeming and scrapers for different platforms.
-                - **Scrape Interval**: How often the bot should check for new promocodes
+                - **Real-time Discord Gateway**: Receives Discord messages the moment they are posted instead of polling for them. Polling takes over whenever the gateway is disconnected, which the countdown shows as `live` or a timer.
+                - **Adapt Polling to Posting Times**: Learns when promocodes are usually posted and polls faster around those times and slower outside them.
+                - **Poll Intervals**: How often the bot should check each platform for new promocodes. Failing platforms are backed off automatically and every platform is polled faster for a while after a promocode is found. A platform that fails 5 times in a row is paused and only probed now and then until it recovers (shown in red in the countdown and in the 'Metrics' tab); press `Ctrl+R` to retry it right away
+                - **Unchanged Polls**: Polls that return the same post as the previous one are dropped right after parsing, without any database, image or OCR work. The 'Metrics' tab shows how many polls of each platform were dropped this way
+                - **Fetch Timeout**: How long to wait for each platform before skipping it for the current scrape
+                - **HTTP Timeout**: Read timeout of a single HTTP request. Connections are kept alive and reused between polls, and transient server errors are retried
 
                 To find the `X Auth Token` and `X CSRF Token` for X (formerly Twitter), you can use your browser's developer tools while logged into your account. Look for `auth_token` and `ct0` cookies respectively in the storage section.
 
@@ -179,7 +287,8 @@ class AppBody(Vertical):
                 ## Usage
                 1. Configure your settings in the 'Settings' tab.
                 2. Monitor logs in the 'Logs' tab to see the bot's activity.
-                3. Ensure your database is set up to store promocodes.
+                3. Check the 'Metrics' tab for p50/p95/p99 latencies of every pipeline stage, per platform, and for the rate limits reported by X and Discord. Requests are paced to stay under those limits, and a throttled platform is polled again as soon as its limit resets.
+                4. Ensure your database is set up to store promocodes.
 
                 ## Support
                 For further assistance, please create an issue on the [GitHub repository](https://github.com/italoseara/csgocases-bot)
@@ -192,6 +301,63 @@ class AppBody(Vertical):
 
                 yield MarkdownViewer(help_text, show_table_of_contents=False, id="help-viewer")
 
+    def on_mount(self) -> None:
+        table = self.query_one("#metrics-table", DataTable)
+        table.add_columns("Platform", "Stage", "Samples", "p50", "p95", "p99")
+
+        table = self.query_one("#sources-table", DataTable)
+        table.add_columns("Platform", "Circuit", "Failures In A Row", "Total Failures", "Unchanged Polls", "Last Error")
+
+        table = self.query_one("#ratelimit-table", DataTable)
+        table.add_columns("Endpoint", "State", "Remaining", "Resets In", "429s")
+
+        self.set_interval(2, self.refresh_metrics)
+
+    def refresh_metrics(self) -> None:
+        """Redraw the latency, circuit breaker and rate-limit tables."""
+
+        table = self.query_one("#metrics-table", DataTable)
+        table.clear()
+
+        for platform, stage, stats in self.app.service.pipeline.metrics.summary():
+            table.add_row(
+                platform,
+                stage,
+                str(stats["count"]),
+                *(_format_seconds(stats[p]) for p in ("p50", "p95", "p99")),
+            )
+
+        table = self.query_one("#sources-table", DataTable)
+        table.clear()
+
+        colors = {"closed": "white", "half-open": "bright_yellow", "open": "red"}
+        sources = self.app.service.pipeline.sources
+        for platform, schedule in self.app.service.scheduler.schedules.items():
+            breaker = schedule.breaker
+            source = sources.get(platform)
+            table.add_row(
+                platform,
+                f"[{colors[breaker.state]}]{breaker.state}[/]",
+                str(breaker.failures),
+                str(breaker.total_failures),
+                f"{source.unchanged}/{source.polls}" if source is not None else "0/0",
+                breaker.last_error or "",
+            )
+
+        table = self.query_one("#ratelimit-table", DataTable)
+        table.clear()
+
+        colors = {"ok": "white", "pacing": "bright_yellow", "throttled": "red"}
+        for endpoint, bucket, state, resets_in in self.app.service.rate_limiter.status():
+            remaining = "?" if bucket.remaining is None else f"{max(0, int(bucket.remaining))}"
+            table.add_row(
+                endpoint,
+                f"[{colors[state]}]{state}[/]",
+                remaining if bucket.limit is None else f"{remaining}/{bucket.limit}",
+                _format_seconds(resets_in),
+                str(bucket.throttled),
+            )
+
     def on_input_changed(self, event: Input.Changed) -> None:
         """Handle input changes."""
 
@@ -206,9 +372,7 @@ class AppBody(Vertical):
         else:
             settings.__dict__[event.input.id] = event.value
 
-        if event.input.id == "database_url":
-            self.app.promocode_repo.url = event.value
-
+        self.app.service.apply_settings()
         settings.save()
 
     def on_checkbox_changed(self, event: Checkbox.Changed) -> None:
@@ -216,4 +380,14 @@ class AppBody(Vertical):
 
         settings = self.app.settings
         settings.__dict__[event.checkbox.id] = event.value
+
+        self.app.service.apply_settings()
         settings.save()
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds >= 60:
+        return f"{seconds / 60:.1f}m"
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    return f"{seconds * 1000:.0f}ms"
@@ -1,10 +1,9 @@
-import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime
 from textual.widgets import Static
 
 
 class Countdown(Static):
-    """A simple countdown timer widget."""
+    """Shows when each source will be polled next."""
 
     DEFAULT_CSS = """
     Countdown {
@@ -16,27 +15,40 @@ class Countdown(Static):
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
-        self.remaining_seconds = 0
-        self.running = True
         self.update_label()
 
     def update_label(self) -> None:
-        if self.app.scraping:
-            self.update("[b]Scraping...[/]")
-            return
+        now = datetime.now()
+        parts = []
 
-        minutes, seconds = divmod(self.remaining_seconds, 60)
-        self.update(f"[b]Next Scrape In:[/] {minutes:02}:{seconds:02}")
+        for platform, schedule in self.app.service.scheduler.schedules.items():
+            if not self.app.service.is_enabled(platform):
+                parts.append(f"[b]{platform}[/] [dim]off[/]")
+                continue
 
-    async def on_mount(self) -> None:
-        self.set_interval(1, self.tick)
+            if self.app.service.is_live(platform):
+                parts.append(f"[b]{platform}[/] [light_green]live[/]")
+                continue
 
-    def tick(self) -> None:
-        self.remaining_seconds = int((self.app.next_scrape - datetime.now()).total_seconds())
-        self.remaining_seconds = max(0, self.remaining_seconds)
-        self.update_label()
+            if schedule.polling:
+                parts.append(f"[b]{platform}[/] ...")
+                continue
+
+            remaining = max(0, int((schedule.next_poll - now).total_seconds()))
+            minutes, seconds = divmod(remaining, 60)
+
+            if schedule.breaker.state == "open":
+                color = "red"
+            elif schedule.backing_off:
+                color = "bright_yellow"
+            elif schedule.boosted(now):
+                color = "light_green"
+            else:
+                color = "white"
 
-        if self.remaining_seconds == 0:
-            if not self.app.scraping:
-                asyncio.create_task(asyncio.to_thread(self.app.scrape))
-                self.app.next_scrape = datetime.now() + timedelta(minutes=self.app.settings.scrape_interval)
\ No newline at end of file
+            parts.append(f"[b]{platform}[/] [{color}]{minutes:02}:{seconds:02}[/]")
+
+        self.update("  ".join(parts))
+
+    async def on_mount(self) -> None:
+        self.set_interval(1, self.update_label)
@@ -0,0 +1,290 @@
+import json
+import time
+import asyncio
+import aiohttp
+import requests
+from dataclasses import dataclass
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator, Mapping, Optional
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .ratelimit import RateLimiter
+
+# Transient server errors worth retrying. 429 is deliberately absent so rate limits are not hammered
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Read size for streamed bodies
+STREAM_CHUNK_SIZE = 1 << 14
+
+
+class HTTPClient:
+    """Long-lived HTTP client shared by every integration.
+
+    Wraps a single `requests.Session` so connections (and their DNS lookups and TLS handshakes) are kept
+    alive and reused across polls, with one connection pool per host, a default timeout and a retry policy
+    for transient failures.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        connect_timeout: float = 3.05,
+        retries: int = 2,
+        backoff_factor: float = 0.3,
+        pool_connections: int = 16,
+        pool_maxsize: int = 8,
+        limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.limiter = limiter
+
+        self.session = requests.Session()
+
+        # Cookies are always passed explicitly; don't let one platform's Set-Cookie leak into later requests
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        self.configure(retries=retries, backoff_factor=backoff_factor)
+
+    def configure(
+        self,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        backoff_factor: float = 0.3,
+    ) -> None:
+        """Change the default timeout and/or retry policy. Changing retries remounts the adapters, resetting the pools."""
+
+        if timeout is not None:
+            self.timeout = timeout
+
+        if retries is None:
+            return
+
+        # Only idempotent GETs are retried. Retry-After is left to the rate limiter; urllib3 would otherwise
+        # sleep through and retry 429s on its own
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET `url`, paced by the rate limiter if there is one."""
+
+        kwargs.setdefault("timeout", (self.connect_timeout, self.timeout))
+
+        if self.limiter is not None:
+            time.sleep(self.limiter.reserve(url))
+
+        response = self.session.get(url, **kwargs)
+
+        if self.limiter is not None:
+            self.limiter.update(url, response.status_code, response.headers)
+
+        return response
+
+    @contextmanager
+    def stream(self, url: str, **kwargs) -> Iterator[requests.Response]:
+        """GET `url` without reading the body, for callers that parse it as it arrives.
+
+        The connection is closed on exit, so a caller that has what it needs can stop reading early; the rest
+        of the body is never downloaded.
+        """
+
+        response = self.get(url, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            response.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_client: Optional[HTTPClient] = None
+
+
+def get_default_client() -> HTTPClient:
+    """Process-wide client used when an integration isn't given one explicitly."""
+
+    global _default_client
+    if _default_client is None:
+        _default_client = HTTPClient()
+    return _default_client
+
+
+class HTTPStatusError(Exception):
+    """Raised by `HTTPResponse.raise_for_status` for 4xx/5xx responses."""
+
+    def __init__(self, status_code: int, reason: str, url: str) -> None:
+        super().__init__(f"{status_code} {reason} for url: {url}")
+        self.status_code = status_code
+        self.reason = reason
+        self.url = url
+
+
+@dataclass
+class HTTPResponse:
+    """Fully read response returned by `AsyncHTTPClient`, mirroring the parts of `requests.Response` we use."""
+
+    status_code: int
+    reason: str
+    url: str
+    headers: Mapping[str, str]
+    content: bytes
+    encoding: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise HTTPStatusError(self.status_code, self.reason, self.url)
+
+
+class AsyncHTTPClient:
+    """Async counterpart of `HTTPClient`, built on a single long-lived `aiohttp.ClientSession`.
+
+    Requests run natively on the event loop, so dozens of sources can be in flight without one OS thread
+    each. The session is created lazily on first use so it binds to the loop that actually runs the bot.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        connect_timeout: float = 3.05,
+        retries: int = 2,
+        backoff_factor: float = 0.3,
+        limit_per_host: int = 8,
+        limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.limit_per_host = limit_per_host
+        self.limiter = limiter
+
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def configure(self, timeout: Optional[float] = None, retries: Optional[int] = None) -> None:
+        if timeout is not None:
+            self.timeout = timeout
+        if retries is not None:
+            self.retries = retries
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host, ttl_dns_cache=300, keepalive_timeout=60),
+                # Cookies are always passed explicitly; don't let one platform's Set-Cookie leak into later requests
+                cookie_jar=aiohttp.DummyCookieJar(),
+            )
+        return self._session
+
+    async def get(self, url: str, **kwargs) -> HTTPResponse:
+        """GET `url` and read the whole body, retrying connection errors and 5xx responses.
+
+        Every attempt is paced by the rate limiter if there is one.
+        """
+
+        kwargs.setdefault("timeout", aiohttp.ClientTimeout(connect=self.connect_timeout, sock_read=self.timeout))
+
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                await asyncio.sleep(self.limiter.reserve(url))
+
+            try:
+                async with self.session.get(url, **kwargs) as response:
+                    if self.limiter is not None:
+                        self.limiter.update(url, response.status, response.headers)
+
+                    if response.status not in RETRY_STATUSES or attempt >= self.retries:
+                        return HTTPResponse(
+                            status_code=response.status,
+                            reason=response.reason or "",
+                            url=str(response.url),
+                            headers=response.headers,
+                            content=await response.read(),
+                            encoding=response.charset,
+                        )
+            except (aiohttp.ClientConnectionError, TimeoutError):
+                if attempt >= self.retries:
+                    raise
+
+            await asyncio.sleep(self.backoff_factor * 2**attempt)
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(self, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """GET `url` without reading the body, for callers that parse it as it arrives.
+
+        Connection errors and 5xx responses are retried like in `get` until the body starts to be read. The
+        response is closed on exit, so a caller that has what it needs can stop reading early.
+        """
+
+        kwargs.setdefault("timeout", aiohttp.ClientTimeout(connect=self.connect_timeout, sock_read=self.timeout))
+
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                await asyncio.sleep(self.limiter.reserve(url))
+
+            try:
+                response = await self.session.get(url, **kwargs)
+            except (aiohttp.ClientConnectionError, TimeoutError):
+                if attempt >= self.retries:
+                    raise
+            else:
+                if self.limiter is not None:
+                    self.limiter.update(url, response.status, response.headers)
+
+                if response.status not in RETRY_STATUSES or attempt >= self.retries:
+                    break
+                response.release()
+
+            await asyncio.sleep(self.backoff_factor * 2**attempt)
+            attempt += 1
+
+        try:
+            yield response
+        finally:
+            response.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_default_async_client: Optional[AsyncHTTPClient] = None
+
+
+def get_default_async_client() -> AsyncHTTPClient:
+    """Process-wide async client used when an integration isn't given one explicitly."""
+
+    global _default_async_client
+    if _default_async_client is None:
+        _default_async_client = AsyncHTTPClient()
+    return _default_async_client
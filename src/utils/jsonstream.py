@@ -0,0 +1,290 @@
+import re
+import json
+import codecs
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, Sequence, Union
+
+# A path step: a key, alternative keys, or EACH to go through every item of an array
+Step = Union[str, tuple[str, ...]]
+EACH = "*"
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR_END = re.compile(r"[,}\]\s]")
+# An object member up to its value, taking the value along when it is a complete string or scalar
+_MEMBER = re.compile(r'[\s,]*"([^"\\]*(?:\\.[^"\\]*)*)"\s*:\s*(?:("[^"\\]*(?:\\.[^"\\]*)*"|[-+.\w]+)(?=\s*[,}]))?')
+
+_DECODER = json.JSONDecoder()
+
+# Drop the consumed part of the buffer once it is this long
+_TRIM_AT = 1 << 16
+
+# `_expect` value for a value that is skipped whole
+_SKIP = -1
+
+
+class JSONStreamError(ValueError):
+    """Raised when the streamed document is not valid JSON or ends early."""
+
+
+class JSONItemStream:
+    """Decodes the items of one array deep inside a JSON document while the document is still arriving.
+
+    Chunks are fed as they are downloaded. Everything outside the `path` is skipped with a few regex searches
+    over the raw text, without building any objects, and only the items of the target array are decoded
+    (with the C decoder, one at a time). The caller can stop feeding as soon as it has the items it needs,
+    so the rest of the document is never downloaded or parsed.
+
+    Each step of the path is a key, a tuple of alternative keys, or `EACH` to descend into every item of an
+    array. When the path leads to something other than an array it is returned as a single item.
+    """
+
+    def __init__(self, path: Sequence[Union[Step, str]]) -> None:
+        self.path = [step if step == EACH or isinstance(step, tuple) else (step,) for step in path]
+        self.done = False  # The target was read to the end (or the document ended)
+
+        self._text = ""
+        self._pos = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+
+        # Containers being walked: ("{", index of the step to match keys against) or ("[", step of the items)
+        self._stack: list[tuple[str, int]] = []
+        self._expect = 0  # Step of the value to read next, None while inside a container
+        self._skip_depth = 0  # Nesting of the value being skipped, 0 when not skipping
+
+    def feed(self, chunk: Union[bytes, str], final: bool = False) -> list[Any]:
+        """Add the next chunk of the document and return the target items it completed."""
+
+        if self.done:
+            return []
+
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk, final)
+
+        if self._pos >= _TRIM_AT:
+            self._text = self._text[self._pos :]
+            self._pos = 0
+        self._text += chunk
+
+        items: list[Any] = []
+        self._run(items, final)
+        return items
+
+    def close(self) -> list[Any]:
+        """Signal the end of the document and return the last items, raising if it was cut short."""
+
+        items = self.feed(b"", final=True)
+        if not self.done:
+            raise JSONStreamError("unexpected end of document")
+        return items
+
+    def _run(self, items: list[Any], final: bool) -> None:
+        text = self._text
+        length = len(text)
+
+        while not self.done:
+            if self._skip_depth:
+                if not self._skip_container(text, final):
+                    return
+                continue
+
+            pos = _WHITESPACE.match(text, self._pos).end()
+            if pos >= length:
+                self._pos = pos
+                if final:
+                    self.done = not self._stack and self._expect is None
+                    if not self.done:
+                        raise JSONStreamError("unexpected end of document")
+                return
+
+            char = text[pos]
+
+            if self._expect is not None:
+                step = self._expect
+
+                if step == _SKIP:
+                    if not self._skip(text, pos, final):
+                        return
+                    continue
+
+                if step == len(self.path):
+                    if char == "[":
+                        self._stack.append(("[", step))
+                        self._expect = None
+                        self._pos = pos + 1
+                    elif not self._decode(text, pos, items, final):
+                        return
+                    continue
+
+                if char == ("[" if self.path[step] == EACH else "{"):
+                    self._stack.append((char, step))
+                    self._expect = None
+                    self._pos = pos + 1
+                elif not self._skip(text, pos, final):
+                    return
+                continue
+
+            if not self._stack:
+                raise JSONStreamError(f"unexpected data at {pos}")
+
+            kind, step = self._stack[-1]
+
+            # Fast path for the common case of a whole member in the buffer
+            if kind == "{" and char in ',"' and (member := _MEMBER.match(text, pos)) is not None:
+                # Keys are compared raw; escaped keys never match, like in utils.soup
+                if member.group(1) in self.path[step]:
+                    self._expect = step + 1
+                    self._pos = member.end() if member.group(2) is None else member.start(2)
+                elif member.group(2) is None:
+                    self._expect = _SKIP
+                    self._pos = member.end()
+                else:
+                    self._pos = member.end()
+                continue
+
+            if char == ",":
+                self._pos = pos + 1
+            elif char == ("}" if kind == "{" else "]"):
+                self._stack.pop()
+                self._pos = pos + 1
+                if step == len(self.path) and EACH not in self.path:
+                    self.done = True
+                elif not self._stack:
+                    self.done = True
+            elif kind == "[":
+                if step == len(self.path):
+                    if not self._decode(text, pos, items, final):
+                        return
+                else:
+                    self._expect = step + 1
+                    self._pos = pos
+            elif char == '"':
+                key = _STRING.match(text, pos)
+                if key is None:
+                    if final:
+                        raise JSONStreamError(f"unterminated string at {pos}")
+                    self._pos = pos
+                    return
+
+                colon = _WHITESPACE.match(text, key.end()).end()
+                if colon >= length:
+                    self._pos = pos
+                    if final:
+                        raise JSONStreamError("unexpected end of document")
+                    return
+                if text[colon] != ":":
+                    raise JSONStreamError(f"expected ':' at {colon}")
+
+                self._expect = step + 1 if text[pos + 1 : key.end() - 1] in self.path[step] else _SKIP
+                self._pos = colon + 1
+            else:
+                raise JSONStreamError(f"unexpected {char!r} at {pos}")
+
+    def _decode(self, text: str, pos: int, items: list[Any], final: bool) -> bool:
+        """Decode one target item at `pos`; False when it hasn't fully arrived yet."""
+
+        # A number, true, false or null that runs into the end of the buffer may continue in the next chunk
+        if not final and text[pos] not in '{["' and _SCALAR_END.search(text, pos) is None:
+            self._pos = pos
+            return False
+
+        try:
+            item, end = _DECODER.raw_decode(text, pos)
+        except json.JSONDecodeError as error:
+            if final:
+                raise JSONStreamError(str(error)) from None
+            self._pos = pos
+            return False
+
+        items.append(item)
+        self._pos = end
+        if self._expect is not None:
+            self._expect = None
+            if EACH not in self.path:
+                self.done = True
+        return True
+
+    def _skip(self, text: str, pos: int, final: bool) -> bool:
+        """Skip the value starting at `pos` without decoding it; False when more data is needed."""
+
+        char = text[pos]
+
+        if char in "{[":
+            self._expect = None
+            self._skip_depth = 1
+            self._pos = pos + 1
+            return self._skip_container(text, final)
+
+        if char == '"':
+            match = _STRING.match(text, pos)
+            end = match.end() if match is not None else None
+        else:
+            match = _SCALAR_END.search(text, pos)
+            end = match.start() if match is not None else (len(text) if final else None)
+
+        if end is None:
+            self._expect = _SKIP
+            return self._more(pos, final)
+
+        self._expect = None
+        self._pos = end
+        return True
+
+    def _skip_container(self, text: str, final: bool) -> bool:
+        """Continue skipping an object or array; False when more data is needed."""
+
+        pos = self._pos
+        depth = self._skip_depth
+
+        while depth:
+            match = _STRUCTURE.search(text, pos)
+            if match is None:
+                self._pos, self._skip_depth = len(text), depth
+                return self._more(len(text), final)
+
+            char = match.group()
+            if char == '"':
+                string = _STRING.match(text, match.start())
+                if string is None:
+                    self._pos, self._skip_depth = match.start(), depth
+                    return self._more(match.start(), final)
+                pos = string.end()
+            else:
+                depth += 1 if char in "{[" else -1
+                pos = match.end()
+
+        self._pos, self._skip_depth = pos, 0
+        return True
+
+    def _more(self, pos: int, final: bool) -> bool:
+        if final:
+            raise JSONStreamError(f"unexpected end of document at {pos}")
+        self._pos = pos
+        return False
+
+
+def iter_items(chunks: Iterable[bytes], path: Sequence[Step]) -> Iterator[Any]:
+    """Yield the items of the array at `path` as the chunks of a JSON document come in.
+
+    Stop iterating to stop reading: the remaining chunks are left alone.
+    """
+
+    stream = JSONItemStream(path)
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+        if stream.done:
+            return
+    yield from stream.close()
+
+
+async def aiter_items(chunks: AsyncIterable[bytes], path: Sequence[Step]) -> AsyncIterator[Any]:
+    """Async counterpart of `iter_items`."""
+
+    stream = JSONItemStream(path)
+    async for chunk in chunks:
+        for item in stream.feed(chunk):
+            yield item
+        if stream.done:
+            return
+    for item in stream.close():
+        yield item
@@ -0,0 +1,120 @@
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+STAGES = ["fetch", "parse", "dedupe", "text", "download", "ocr", "redeem", "notify", "publish_to_detect", "publish_to_claim"]
+
+
+@dataclass
+class Trace:
+    """Timings of a single post (or poll) on its way through the pipeline, in seconds per stage."""
+
+    platform: str
+    post_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    spans: dict[str, float] = field(default_factory=dict)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def mark_since_published(self, stage: str) -> None:
+        """Record the time elapsed since the post was published under `stage`."""
+
+        if self.created_at is None:
+            return
+
+        # Naive timestamps (Instagram, Facebook) are local time; aware ones (X, Discord) carry their offset
+        self.spans[stage] = (datetime.now(timezone.utc) - self.created_at.astimezone(timezone.utc)).total_seconds()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "platform": self.platform,
+            "post_url": self.post_url,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat(),
+            "spans": self.spans,
+        }
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block and add it to the current trace, if any.
+
+    The trace travels in a context variable, which `asyncio.to_thread` copies into worker threads, so
+    integrations and OCR helpers can open spans without knowing about the pipeline.
+    """
+
+    trace = current_trace.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.add(stage, time.perf_counter() - start)
+
+
+class LatencyTracker:
+    """Keeps rolling per-platform, per-stage latency samples and optionally exports traces as JSON lines.
+
+    `record` only touches memory; `export` appends to the file and is meant to run in a worker thread.
+    """
+
+    def __init__(self, window: int = 500, export_path: Optional[str] = None) -> None:
+        self.window = window
+        self.export_path = export_path
+        self.samples: dict[tuple[str, str], deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace) -> None:
+        with self._lock:
+            for stage, seconds in trace.spans.items():
+                key = (trace.platform, stage)
+                if key not in self.samples:
+                    self.samples[key] = deque(maxlen=self.window)
+                self.samples[key].append(seconds)
+
+    def export(self, trace: Trace) -> None:
+        path = self.export_path
+        if not path:
+            return
+
+        line = json.dumps(trace.to_dict()) + "\n"
+        try:
+            with self._lock, open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            raise IOError(f"Error exporting metrics to {path}: {e}")
+
+    def percentiles(self, platform: str, stage: str) -> dict[str, float]:
+        """p50/p95/p99 (in seconds) and sample count for a platform and stage."""
+
+        with self._lock:
+            values = sorted(self.samples.get((platform, stage), ()))
+
+        if not values:
+            return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+
+        def pick(q: float) -> float:
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        return {"count": len(values), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+    def summary(self) -> list[tuple[str, str, dict[str, float]]]:
+        """Percentiles for every (platform, stage) pair seen so far, ordered by platform then pipeline stage."""
+
+        with self._lock:
+            keys = list(self.samples)
+
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        keys.sort(key=lambda key: (key[0], order.get(key[1], len(order)), key[1]))
+        return [(platform, stage, self.percentiles(platform, stage)) for platform, stage in keys]
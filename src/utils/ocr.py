@@ -1,24 +1,508 @@
+import io
+import os
+import re
+import math
+import itertools
+import threading
+import multiprocessing
 import easyocr
-import requests
 import numpy as np
 from PIL import Image
-from io import BytesIO
+from typing import Iterator, Optional, Union
+from contextlib import contextmanager
+from dataclasses import dataclass
+from concurrent.futures import Executor, Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
+from utils.metrics import span
+from utils.http import STREAM_CHUNK_SIZE, HTTPClient, get_default_client
+from utils.ocrcache import OCRCache
 
-def read_promocode_from_image_url(url: str) -> str:
-    """Read an image from a URL and return the text content."""
+# Devices EasyOCR can run on: the CPU, an NVIDIA GPU (optionally by index) or Apple silicon
+DEVICE_PATTERN = re.compile(r"cpu|mps|cuda(:\d+)?")
 
-    response = requests.get(url)
-    response.raise_for_status()
+# Height of the text lines EasyOCR's recognition network works on
+LINE_HEIGHT = 64
 
-    image = Image.open(BytesIO(response.content))
+# Images are refused past this size; promo images are well under a megabyte
+MAX_IMAGE_BYTES = 10 << 20
+# JPEGs are decoded at a reduced scale as long as the code area keeps at least this many rows
+MIN_CODE_AREA_HEIGHT = 2 * LINE_HEIGHT
 
-    # Crop the image to focus on the code area
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image is larger than the download is allowed to be."""
+
+
+@dataclass(frozen=True)
+class CodeArea:
+    """Where the promocode is printed on one template of promo images, as fractions of the image size."""
+
+    name: str
+    box: tuple[float, float, float, float]  # Left, top, right, bottom
+    aspect: Optional[float] = None  # Width / height of the template's images; None matches any image
+
+    def matches(self, width: int, height: int, tolerance: float = 0.05) -> bool:
+        return self.aspect is None or abs(width / height - self.aspect) <= self.aspect * tolerance
+
+    def bounds(self, width: int, height: int) -> tuple[int, int, int, int]:
+        """The area in pixels on an image of this size."""
+
+        left, top, right, bottom = self.box
+        return round(width * left), round(height * top), round(width * right), round(height * bottom)
+
+
+# Promo image templates, most specific first; the first one that matches the image's shape is used
+CODE_AREAS: tuple[CodeArea, ...] = (CodeArea("default", (0.1, 0.62, 0.9, 0.8)),)
+
+
+class OCREngine:
+    """A single EasyOCR reader kept for the lifetime of the process.
+
+    Building a reader loads the detection and recognition weights from disk, which takes seconds, so it is
+    done once (ideally in the background at startup through `warm_up`) and the reader is reused for every
+    image. The reader is rebuilt lazily when the device changes.
+    """
+
+    ALLOWLIST = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+    def __init__(self, device: str = "cpu", languages: tuple[str, ...] = ("en",)) -> None:
+        if not DEVICE_PATTERN.fullmatch(device):
+            raise ValueError(f"invalid OCR device: {device!r}")
+
+        self.device = device
+        self.languages = languages
+
+        self._reader: Optional[easyocr.Reader] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._reader is not None
+
+    @property
+    def profile(self) -> str:
+        """What the reader is set up to read with; results of one profile are cached apart from another's."""
+
+        return _profile(self.languages)
+
+    def configure(self, device: str) -> bool:
+        """Switch to another device. Returns False (and keeps the current one) if `device` isn't valid."""
+
+        if not DEVICE_PATTERN.fullmatch(device):
+            return False
+
+        with self._lock:
+            if device != self.device:
+                self.device = device
+                self._reader = None
+        return True
+
+    def load(self) -> easyocr.Reader:
+        """Build the reader if it hasn't been yet. Thread-safe; concurrent callers wait for the same load."""
+
+        reader = self._reader
+        if reader is not None:
+            return reader
+
+        with self._lock:
+            if self._reader is None:
+                # EasyOCR takes a device name for `gpu`, or False for the CPU
+                self._reader = easyocr.Reader(list(self.languages), gpu=False if self.device == "cpu" else self.device)
+            return self._reader
+
+    def warm_up(self) -> None:
+        """Load the reader and run it once on a blank image, so the first real image doesn't pay for either."""
+
+        self.load().readtext(np.zeros((64, 256, 3), dtype=np.uint8), allowlist=self.ALLOWLIST, detail=0)
+
+    def read(self, image: Image.Image) -> list[str]:
+        """Return the text lines found in `image`, top to bottom."""
+
+        return self.read_batch([np.array(image.convert("RGB"))])[0]
+
+    def read_batch(self, images: list[np.ndarray]) -> list[list[str]]:
+        """`read` for several RGB arrays. Images of the same size go through the detector as one batch."""
+
+        reader = self.load()
+        if len(images) > 1 and len({image.shape for image in images}) == 1:
+            return reader.readtext_batched(images, allowlist=self.ALLOWLIST, detail=0)
+
+        return [reader.readtext(image, allowlist=self.ALLOWLIST, detail=0) for image in images]
+
+
+class OCRPool:
+    """OCR in a pool of worker processes, each holding its own warmed-up reader.
+
+    Inference runs outside the bot's process, so it doesn't hold the GIL the UI needs, and several images are
+    read at once on different cores. Images are sent to the first free worker as soon as they are submitted;
+    while every worker is busy they queue up, and the next worker to free up takes the queue (up to
+    `max_batch` images) as one batch. Reads are keyed (the pipeline uses the hash of the image bytes), so
+    an image submitted again while it is still being read isn't read twice; every caller still gets its own
+    future, which it can cancel without affecting the others.
+
+    With `workers=0` the reader runs in a single background thread of this process instead.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        device: str = "cpu",
+        languages: tuple[str, ...] = ("en",),
+        max_batch: int = 8,
+    ) -> None:
+        if not DEVICE_PATTERN.fullmatch(device):
+            raise ValueError(f"invalid OCR device: {device!r}")
+
+        self.workers = workers
+        self.device = device
+        self.languages = languages
+        self.max_batch = max_batch
+
+        self.batches = 0  # Sent to the workers
+        self.images = 0
+
+        self._executor: Optional[Executor] = None
+        self._pending: list[tuple[str, np.ndarray, Future]] = []
+        self._jobs: dict[str, Future] = {}  # Shared by every caller that submitted the same key
+        self._busy = 0
+        self._ids = itertools.count()
+        self._lock = threading.RLock()  # Done callbacks can run on the submitting thread
+
+    @property
+    def profile(self) -> str:
+        """See `OCREngine.profile`."""
+
+        return _profile(self.languages)
+
+    @property
+    def slots(self) -> int:
+        """How many batches can be read at the same time."""
+
+        return max(1, self.workers)
+
+    def configure(self, device: str) -> bool:
+        """Switch to another device. Returns False (and keeps the current one) if `device` isn't valid.
+
+        Workers load a reader for the new device on their next batch.
+        """
+
+        if not DEVICE_PATTERN.fullmatch(device):
+            return False
+
+        self.device = device
+        return True
+
+    def warm_up(self) -> None:
+        """Start every worker and load its reader now rather than on the first images."""
+
+        with self._lock:
+            executor = self._get_executor()
+
+        for future in [executor.submit(_load, self.device, self.languages) for _ in range(self.slots)]:
+            future.result()
+
+    def submit(self, key: str, image: Image.Image) -> Future:
+        """Queue an image for OCR. The future resolves to the text lines found in it, top to bottom."""
+
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                job = Future()
+                self._jobs[key] = job
+                self._pending.append((key, np.array(image.convert("RGB")), job))
+                self._dispatch()
+
+        # Every caller gets its own future, so one that gives up and cancels it doesn't cancel the shared read
+        future = Future()
+        job.add_done_callback(lambda job: _copy_outcome(job, future))
+        return future
+
+    def read(self, image: Image.Image) -> list[str]:
+        """Read a single image, blocking until it's done."""
+
+        return self.submit(f"#{next(self._ids)}", image).result()
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            pending, self._pending = self._pending, []
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._resolve(pending, error=RuntimeError("the OCR pool was shut down"))
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                # Split the cores between the workers instead of letting every one of them use all of them
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                self._executor = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.device, self.languages, threads),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(1, thread_name_prefix="ocr")
+
+        return self._executor
+
+    def _dispatch(self) -> None:
+        while self._pending and self._busy < self.slots:
+            batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch :]
+            images = [image for _, image, _ in batch]
+
+            try:
+                job = self._get_executor().submit(_read_batch, self.device, self.languages, images)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._executor = None
+                self._resolve(batch, error=e)
+                continue
+
+            self._busy += 1
+            self.batches += 1
+            self.images += len(batch)
+            job.add_done_callback(lambda job, batch=batch: self._finish(batch, job))
+
+    def _finish(self, batch: list[tuple[str, np.ndarray, Future]], job: Future) -> None:
+        if job.cancelled():
+            results, error = None, RuntimeError("the OCR pool was shut down")
+        elif job.exception() is not None:
+            results, error = None, job.exception()
+        else:
+            results, error = job.result(), None
+
+        with self._lock:
+            self._busy -= 1
+            if isinstance(error, BrokenProcessPool):
+                # A worker died (e.g. out of memory); start a fresh pool for the next images
+                self._executor = None
+            self._dispatch()
+
+        self._resolve(batch, results, error)
+
+    def _resolve(
+        self,
+        batch: list[tuple[str, np.ndarray, Future]],
+        results: Optional[list[list[str]]] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        with self._lock:
+            for key, _, job in batch:
+                if self._jobs.get(key) is job:
+                    del self._jobs[key]
+
+        for i, (_, _, job) in enumerate(batch):
+            if error is not None:
+                job.set_exception(error)
+            else:
+                job.set_result(results[i])
+
+
+def _copy_outcome(job: Future, future: Future) -> None:
+    try:
+        if job.exception() is not None:
+            future.set_exception(job.exception())
+        else:
+            future.set_result(job.result())
+    except InvalidStateError:
+        pass  # Cancelled by a caller that no longer needs it
+
+
+def _profile(languages: tuple[str, ...]) -> str:
+    return ",".join(languages)
+
+
+# The reader of the current process: of a pool worker, or of the bot itself when OCR runs in a thread
+_process_engine: Optional[OCREngine] = None
+
+
+def _engine_for(device: str, languages: tuple[str, ...]) -> OCREngine:
+    global _process_engine
+    if _process_engine is None or (_process_engine.device, _process_engine.languages) != (device, languages):
+        _process_engine = OCREngine(device, languages)
+    return _process_engine
+
+
+def _init_worker(device: str, languages: tuple[str, ...], threads: int) -> None:
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    _engine_for(device, languages).warm_up()
+
+
+def _load(device: str, languages: tuple[str, ...]) -> None:
+    _engine_for(device, languages).load()
+
+
+def _read_batch(device: str, languages: tuple[str, ...], images: list[np.ndarray]) -> list[list[str]]:
+    return _engine_for(device, languages).read_batch(images)
+
+
+_default_engine: Optional[OCREngine] = None
+
+
+def get_default_engine() -> OCREngine:
+    """Process-wide engine used when a caller isn't given one explicitly."""
+
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = OCREngine()
+    return _default_engine
+
+
+@contextmanager
+def fetch_image(url: str, http: Optional[HTTPClient] = None, max_bytes: int = MAX_IMAGE_BYTES) -> Iterator[memoryview]:
+    """Download an image, raising `ImageTooLargeError` as soon as it turns out to be larger than `max_bytes`.
+
+    The body is streamed into a buffer the calling thread reuses from one image to the next, instead of being
+    collected in chunks, joined and copied again to be decoded. The view of it is only valid inside the block.
+    """
+
+    with span("download"), (http or get_default_client()).stream(url) as response:
+        response.raise_for_status()
+
+        length = int(response.headers.get("Content-Length") or 0)
+        if length > max_bytes:
+            raise ImageTooLargeError(f"image of {length} bytes is larger than {max_bytes} bytes")
+
+        buffer = _download_buffer(length or STREAM_CHUNK_SIZE)
+        size = 0
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            end = size + len(chunk)
+            if end > max_bytes:
+                raise ImageTooLargeError(f"image is larger than {max_bytes} bytes")
+            if end > len(buffer):
+                buffer.extend(bytes(max(end, 2 * len(buffer)) - len(buffer)))
+
+            buffer[size:end] = chunk
+            size = end
+
+    try:
+        with memoryview(buffer) as view, view[:size] as data:
+            yield data
+    finally:
+        if len(buffer) > _KEEP_BUFFER_BYTES:
+            _buffers.download = None
+
+
+# Download buffers are kept per thread up to this size
+_KEEP_BUFFER_BYTES = 4 << 20
+
+_buffers = threading.local()
+
+
+def _download_buffer(size: int) -> bytearray:
+    buffer = getattr(_buffers, "download", None)
+    if buffer is None:
+        buffer = _buffers.download = bytearray(size)
+    elif len(buffer) < size:
+        buffer.extend(bytes(size - len(buffer)))
+    return buffer
+
+
+class _BufferFile(io.RawIOBase):
+    """A read-only file over a buffer, for PIL to decode from without the copy `BytesIO` would make."""
+
+    def __init__(self, buffer: Union[bytes, memoryview]) -> None:
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        count = max(0, min(len(target), len(self._view) - self._pos))
+        target[:count] = self._view[self._pos : self._pos + count]
+        self._pos += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._pos = max(0, offset + (0, self._pos, len(self._view))[whence])
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def crop_code_area(data: Union[bytes, memoryview], areas: tuple[CodeArea, ...] = CODE_AREAS) -> Image.Image:
+    """Decode the area of an image the promocode is printed in, according to its template.
+
+    JPEGs are decoded at the lowest scale that keeps `MIN_CODE_AREA_HEIGHT` rows in the area, through
+    `Image.draft` (libjpeg can decode at 1/2, 1/4 or 1/8 of the size for a fraction of the cost and memory).
+    Other formats are decoded whole; Pillow has no public way to stop a decoder early.
+    """
+
+    with _BufferFile(data) as file:
+        return _decode_code_area(Image.open(file), areas)
+
+
+def _decode_code_area(image: Image.Image, areas: tuple[CodeArea, ...]) -> Image.Image:
     width, height = image.size
-    image = image.crop((width * 0.1, height * 0.62, width * 0.9, height * 0.8))
-    image = image.convert("RGB")
+    area = next((area for area in areas if area.matches(width, height)), areas[-1])
+    left, top, right, bottom = area.bounds(width, height)
+
+    if image.format == "JPEG":
+        scale = min(1.0, MIN_CODE_AREA_HEIGHT / max(1, bottom - top))
+        image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+
+        factor = image.width / width
+        left, top, right, bottom = (round(bound * factor) for bound in (left, top, right, bottom))
+
+    return image.crop((left, top, right, bottom)).convert("RGB")
+
+
+def load_code_area(
+    url: str, http: Optional[HTTPClient] = None, cache: Optional[OCRCache] = None, profile: str = ""
+) -> tuple[str, Optional[str], Optional[Image.Image]]:
+    """Download an image and decode its code area, unless `cache` already knows what it says under `profile`.
+
+    Returns the digest of the image bytes, the cached promocode (None if there is none) and the code area
+    (None when the promocode was cached).
+    """
+
+    with fetch_image(url, http) as data:
+        digest = OCRCache.digest(data)
+        promocode = cache.get(digest, profile) if cache is not None else None
+        return digest, promocode, crop_code_area(data) if promocode is None else None
+
+
+def parse_promocode(lines: list[str]) -> str:
+    """The promocode among the text lines read from a code area (empty if there is none)."""
+
+    return lines[0].strip() if lines else ""
+
+
+def read_promocode_from_image_url(
+    url: str,
+    http: Optional[HTTPClient] = None,
+    engine: Optional[Union[OCREngine, OCRPool]] = None,
+    cache: Optional[OCRCache] = None,
+) -> str:
+    """Read an image from a URL and return the text content (empty if there is none)."""
+
+    engine = engine or get_default_engine()
+    if cache is not None and (promocode := cache.lookup(url, engine.profile)) is not None:
+        return promocode
 
-    reader = easyocr.Reader(["en"], gpu=True)
-    result = reader.readtext(np.array(image), allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789", detail=0)
+    digest, promocode, image = load_code_area(url, http, cache, engine.profile)
+    if promocode is None:
+        with span("ocr"):
+            promocode = parse_promocode(engine.read(image))
 
-    return result[0].strip()
+    if cache is not None:
+        cache.put(url, digest, promocode, engine.profile)
+    return promocode
@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Self, Optional
+from collections import OrderedDict
+
+
+class OCRCache:
+    """Promocodes already read from images, by media URL and by the hash of the image bytes.
+
+    A URL hit skips both the download and OCR. A cross-posted image shows up under a different URL on every
+    platform, but its bytes are usually the same, so after the download a hash hit still skips OCR.
+
+    Promocodes are stored per OCR `profile` (see `OCREngine.profile`), so what one reader setup read isn't
+    served once another one is in use. Images nothing was read from aren't cached: a misread or a partially
+    loaded image would otherwise never be read again. Both indexes are LRUs of `max_entries`, and the whole
+    cache is saved to a small JSON file so it survives restarts.
+    """
+
+    CACHE_PATH = "data/ocr_cache.json"
+
+    def __init__(self, max_entries: int = 1000) -> None:
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self.urls: OrderedDict[str, str] = OrderedDict()  # Media URL -> digest
+        self.codes: OrderedDict[str, str] = OrderedDict()  # "<profile>/<digest>" -> promocode
+        self._lock = threading.Lock()  # Saving runs in a worker thread
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def lookup(self, url: str, profile: str) -> Optional[str]:
+        """The promocode read from the image at `url`, or None if it hasn't been read yet."""
+
+        with self._lock:
+            digest = self.urls.get(url)
+            if digest is None or _key(profile, digest) not in self.codes:
+                return None
+
+            self.urls.move_to_end(url)
+            return self._hit(_key(profile, digest))
+
+    def get(self, digest: str, profile: str) -> Optional[str]:
+        """The promocode read from an image with these bytes, or None if it hasn't been read yet."""
+
+        with self._lock:
+            if _key(profile, digest) not in self.codes:
+                self.misses += 1
+                return None
+
+            return self._hit(_key(profile, digest))
+
+    def put(self, url: str, digest: str, promocode: str, profile: str) -> bool:
+        """Remember what was read from an image. Returns False if there is nothing new to save.
+
+        Empty results aren't remembered, so the image is read again the next time it shows up.
+        """
+
+        key = _key(profile, digest)
+        with self._lock:
+            if not promocode or (self.urls.get(url) == digest and self.codes.get(key) == promocode):
+                return False
+
+            self.urls[url] = digest
+            self.urls.move_to_end(url)
+            self.codes[key] = promocode
+            self.codes.move_to_end(key)
+
+            while len(self.urls) > self.max_entries:
+                self.urls.popitem(last=False)
+            while len(self.codes) > self.max_entries:
+                self.codes.popitem(last=False)
+            return True
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, **kwargs) -> Self:
+        cache = cls(**kwargs)
+
+        try:
+            with open(path or cls.CACHE_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cache
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Error decoding OCR cache file: {e}")
+
+        # Saved least recently used first, so replaying the entries restores the order. Files of older versions
+        # have entries without a profile and empty ones, which are dropped so those images are read again
+        for key, promocode in data.get("codes", {}).items():
+            if promocode and "/" in key:
+                cache.codes[key] = promocode
+        for url, digest in data.get("urls", {}).items():
+            cache.urls[url] = digest
+        return cache
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.CACHE_PATH
+
+        with self._lock:
+            data = json.dumps({"urls": self.urls, "codes": self.codes}, separators=(",", ":"))
+
+        try:
+            # Written next to the cache and swapped in, so a crash mid-write can't leave a truncated file
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+        except Exception as e:
+            raise IOError(f"Error saving OCR cache file: {e}")
+
+    def _hit(self, key: str) -> str:
+        self.hits += 1
+        self.codes.move_to_end(key)
+        return self.codes[key]
+
+
+def _key(profile: str, digest: str) -> str:
+    return f"{profile}/{digest}"
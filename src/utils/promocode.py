@@ -0,0 +1,38 @@
+import re
+from typing import Optional
+
+# Links, Discord mentions/emojis and hashtags, which are full of code-like tokens
+_NOISE = re.compile(r"https?://\S+|www\.\S+|<[@#:!&a][^>]*>|[#@]\w+")
+
+# The word that introduces a code ("promocode", "promo code", "code"), but not the end of "barcode" or "decode"
+_KEYWORD = r"\b(?i:promo[\s-]*code|code)"
+# Characters codes are printed in: the same as the OCR allowlist
+_CODE = r"[A-Z0-9]{4,24}"
+# Quotes and markdown emphasis put around a code
+_OPEN = r"[\"'«“‘`*_]"
+_CLOSE = r"[\"'»”’`*_]"
+
+# Patterns for the code in a post's text, most reliable first. A text hit skips OCR, so a bare token only
+# counts as a code with a digit in it; otherwise "PROMOCODE - LIKE" would spend a claim on "LIKE".
+PROMOCODE_PATTERNS = (
+    # "promocode «WINTER»", "code: **WINTER**": set apart by quotes or emphasis, the code may be letters only
+    re.compile(rf"{_KEYWORD}\s*(?:[:=–—-]\s*)?{_OPEN}+({_CODE}){_CLOSE}"),
+    # "promocode: WINTER25", "code = 2024"
+    re.compile(rf"{_KEYWORD}\s*[:=–—-]\s*(?=[A-Z0-9]*\d)({_CODE})(?![\w-])"),
+    # "promocode WINTER25": without punctuation, the code needs both letters and digits to tell it from words
+    re.compile(rf"{_KEYWORD}\s+(?=[A-Z0-9]*[A-Z])(?=[A-Z0-9]*\d)({_CODE})(?![\w-])"),
+)
+
+
+def find_promocode(text: Optional[str]) -> str:
+    """The promocode written in a post's text (empty if there is none)."""
+
+    if not text:
+        return ""
+
+    text = _NOISE.sub(" ", text)
+    for pattern in PROMOCODE_PATTERNS:
+        match = pattern.search(text)
+        if match is not None:
+            return match.group(1)
+    return ""
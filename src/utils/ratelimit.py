@@ -0,0 +1,184 @@
+import time
+import threading
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+from urllib.parse import urlsplit
+
+
+class RateLimitedError(Exception):
+    """Raised instead of sending a request that the server would certainly reject with 429."""
+
+    def __init__(self, key: str, retry_after: float) -> None:
+        super().__init__(f"rate limited by {key}, retry in {retry_after:.0f}s")
+        self.key = key
+        self.retry_after = retry_after
+
+
+@dataclass
+class TokenBucket:
+    """What a server told us about one rate limit, refilled when its window resets.
+
+    Times are `time.monotonic()` seconds.
+    """
+
+    limit: Optional[int] = None
+    remaining: Optional[float] = None
+    reset_at: Optional[float] = None
+    blocked_until: float = 0.0
+    next_slot: float = 0.0
+    throttled: int = 0  # 429 responses received
+
+    def refill(self, now: float) -> None:
+        if self.reset_at is not None and now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = None
+
+    def interval(self, now: float) -> float:
+        """Pause between requests that spreads the remaining tokens evenly over the rest of the window."""
+
+        if self.remaining is None or self.reset_at is None or self.remaining <= 0:
+            return 0.0
+
+        return (self.reset_at - now) / self.remaining
+
+
+class RateLimiter:
+    """Per-host token buckets fed by the rate-limit headers of X and Discord.
+
+    X (`x-rate-limit-*`) and Discord (`X-RateLimit-*`) report how many requests are left and when the window
+    resets; `Retry-After` comes with 429s from any host. Before each request `reserve` says how long to wait
+    so that requests are paced just under the limit, and refuses outright (`RateLimitedError`) when the wait
+    would be longer than `max_wait`, so the poller backs off instead of hanging. Both platforms limit each
+    endpoint separately, so buckets are keyed by host and path.
+    """
+
+    def __init__(self, max_wait: float = 10.0, default_retry_after: float = 60.0) -> None:
+        self.max_wait = max_wait
+        self.default_retry_after = default_retry_after
+
+        self.buckets: dict[str, TokenBucket] = {}
+        self._host_blocked_until: dict[str, float] = {}  # Discord global rate limits
+        self._lock = threading.Lock()  # The sync client is used from worker threads
+
+    def reserve(self, url: str) -> float:
+        """Take a token for a request to `url` and return how many seconds to wait before sending it."""
+
+        key, host = self._key(url)
+
+        with self._lock:
+            now = time.monotonic()
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                return 0.0
+
+            bucket.refill(now)
+
+            slot = max(now, bucket.next_slot, bucket.blocked_until, self._host_blocked_until.get(host, 0.0))
+            if bucket.remaining is not None and bucket.remaining <= 0 and bucket.reset_at is not None:
+                slot = max(slot, bucket.reset_at)
+
+            wait = slot - now
+            if wait > self.max_wait:
+                raise RateLimitedError(key, wait)
+
+            bucket.next_slot = slot + bucket.interval(slot)
+            if bucket.remaining is not None:
+                bucket.remaining -= 1
+
+            return wait
+
+    def update(self, url: str, status_code: int, headers: Mapping[str, str]) -> None:
+        """Learn the current limits from a response's headers (header lookups must be case-insensitive)."""
+
+        key, host = self._key(url)
+        limit = _number(headers.get("X-RateLimit-Limit") or headers.get("X-Rate-Limit-Limit"))
+        remaining = _number(headers.get("X-RateLimit-Remaining") or headers.get("X-Rate-Limit-Remaining"))
+        retry_after = _retry_after(headers.get("Retry-After"))
+
+        if limit is None and remaining is None and retry_after is None and status_code != 429:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            bucket = self.buckets.setdefault(key, TokenBucket())
+
+            if limit is not None:
+                bucket.limit = int(limit)
+            if remaining is not None:
+                bucket.remaining = remaining
+
+            # Discord sends a relative reset, X an epoch timestamp
+            reset_after = _number(headers.get("X-RateLimit-Reset-After"))
+            reset = _number(headers.get("X-RateLimit-Reset") or headers.get("X-Rate-Limit-Reset"))
+            if reset_after is not None:
+                bucket.reset_at = now + reset_after
+            elif reset is not None:
+                bucket.reset_at = now + max(0.0, reset - time.time())
+
+            if status_code == 429:
+                bucket.throttled += 1
+                if retry_after is None:
+                    retry_after = bucket.reset_at - now if bucket.reset_at is not None else self.default_retry_after
+
+            if retry_after is not None:
+                if headers.get("X-RateLimit-Global", "").lower() == "true":
+                    self._host_blocked_until[host] = now + retry_after
+                else:
+                    bucket.blocked_until = now + retry_after
+
+    def status(self) -> list[tuple[str, TokenBucket, str, float]]:
+        """(key, bucket, state, seconds until the window resets or the block lifts) for every known bucket.
+
+        The state is `throttled` while requests are blocked, `pacing` while they are being spread out and
+        `ok` otherwise.
+        """
+
+        rows = []
+        with self._lock:
+            now = time.monotonic()
+            for key, bucket in sorted(self.buckets.items()):
+                bucket.refill(now)
+                blocked_until = max(bucket.blocked_until, self._host_blocked_until.get(urlsplit("//" + key).netloc, 0.0))
+
+                if blocked_until > now or (bucket.remaining is not None and bucket.remaining <= 0):
+                    state, until = "throttled", max(blocked_until, bucket.reset_at or 0.0)
+                elif bucket.next_slot > now:
+                    state, until = "pacing", bucket.reset_at or bucket.next_slot
+                else:
+                    state, until = "ok", bucket.reset_at or now
+
+                rows.append((key, bucket, state, max(0.0, until - now)))
+
+        return rows
+
+    @staticmethod
+    def _key(url: str) -> tuple[str, str]:
+        parts = urlsplit(url)
+        return parts.netloc + parts.path, parts.netloc
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a `Retry-After` header, given either in seconds or as an HTTP date."""
+
+    if value is None:
+        return None
+
+    seconds = _number(value)
+    if seconds is not None:
+        return max(0.0, seconds)
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
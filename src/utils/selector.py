@@ -0,0 +1,119 @@
+import re
+from typing import Any, Callable, Optional
+
+_REQUIRED = object()
+_EACH = object()  # The `[*]` step; a plain "*" step is a key like any other
+
+_STEP = re.compile(r"([^.\[\]]+)|\[(-?\d+|\*)\]")
+_PATH = re.compile(r"(?:[^.\[\]]+|\[(?:-?\d+|\*)\])(?:\.[^.\[\]]+|\[(?:-?\d+|\*)\])*")
+
+Accessor = Callable[[Any], Any]
+
+
+class SelectorError(LookupError):
+    """Raised when a required field is missing from a payload, usually because the platform changed its shape."""
+
+
+def compile_path(path: str) -> Accessor:
+    """Compile a path like `content.story.actors[0].name` into a function that follows it.
+
+    `[n]` indexes lists (negative indexes count from the end) and `[*]` maps the rest of the path over every
+    item of a list, skipping items where it leads nowhere. The accessor returns `None` when the path doesn't
+    match.
+    """
+
+    return _accessor(_parse(path))
+
+
+class Field:
+    """One value of a payload, taken from the first of several alternative paths that leads to a non-null value.
+
+    Without a `default` (or `default_factory`) the field is required and `SelectorError` is raised when every
+    path misses. `convert` is applied to values found in the payload, not to the default.
+    """
+
+    __slots__ = ("paths", "default", "default_factory", "convert", "accessors")
+
+    def __init__(
+        self,
+        *paths: str,
+        default: Any = _REQUIRED,
+        default_factory: Optional[Callable[[], Any]] = None,
+        convert: Optional[Callable[[Any], Any]] = None,
+    ) -> None:
+        self.paths = paths
+        self.default = default
+        self.default_factory = default_factory
+        self.convert = convert
+        self.accessors = [compile_path(path) for path in paths]
+
+    def get(self, obj: Any) -> Any:
+        for accessor in self.accessors:
+            value = accessor(obj)
+            if value is not None:
+                return value if self.convert is None else self.convert(value)
+
+        if self.default_factory is not None:
+            return self.default_factory()
+        if self.default is _REQUIRED:
+            raise SelectorError(f"none of {', '.join(self.paths)} found")
+        return self.default
+
+
+class Schema:
+    """A set of named fields extracted from the same payload in one go."""
+
+    def __init__(self, **fields: Field) -> None:
+        self.fields = fields
+
+    def extract(self, obj: Any) -> dict[str, Any]:
+        return {name: field.get(obj) for name, field in self.fields.items()}
+
+
+def _parse(path: str) -> list[Any]:
+    if not _PATH.fullmatch(path):
+        raise ValueError(f"invalid path: {path!r}")
+
+    return [name if name else (_EACH if index == "*" else int(index)) for name, index in _STEP.findall(path)]
+
+
+def _accessor(steps: list[Any]) -> Accessor:
+    if _EACH in steps:
+        split = steps.index(_EACH)
+        return _each(_accessor(steps[:split]), _accessor(steps[split + 1 :]))
+
+    if len(steps) == 1 and isinstance(steps[0], str):
+        key = steps[0]
+        return lambda obj: obj.get(key) if isinstance(obj, dict) else None
+
+    steps = tuple(steps)
+
+    def accessor(obj):
+        # `.get()` rather than subscripts for keys: paths miss all the time (optional fields, alternatives,
+        # timeline entries of another kind), and a raised KeyError costs more than the whole walk
+        try:
+            for step in steps:
+                obj = obj[step] if step.__class__ is int else obj.get(step)
+                if obj is None:
+                    return None
+        except (AttributeError, KeyError, IndexError, TypeError):
+            return None  # A payload of an unexpected shape, e.g. a list where a dict should be
+        return obj
+
+    return accessor
+
+
+def _each(head: Accessor, tail: Accessor) -> Accessor:
+    def accessor(obj):
+        items = head(obj)
+        if not isinstance(items, list):
+            return None
+
+        values = []
+        for item in items:
+            value = tail(item)
+            if value is not None:
+                values.append(value)
+        return values
+
+    return accessor
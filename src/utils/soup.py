@@ -1,6 +1,17 @@
+import re
 import json
+import codecs
+from typing import Optional, Union
 from bs4 import BeautifulSoup
 
+# Opening tag of a script block; the type is checked separately since attributes come in any order
+_SCRIPT_OPEN = re.compile(r"<script\b([^>]*)>", re.IGNORECASE)
+_SCRIPT_CLOSE = re.compile(r"</script\s*>", re.IGNORECASE)
+_JSON_TYPE = re.compile(r"""\btype\s*=\s*(["']?)application/json\1(?=[\s/]|$)""", re.IGNORECASE)
+
+# Drop the scanned part of a streamed page once it is this long
+_TRIM_AT = 1 << 16
+
 
 def extract_json_objects_containing_key(html: str, key: str) -> list[dict]:
     """Extract JSON objects from script tags that contain the specified key."""
@@ -29,6 +40,93 @@ def extract_json_objects_containing_key(html: str, key: str) -> list[dict]:
     return unique
 
 
+def scan_json_objects_containing_key(html: str, key: str) -> list[dict]:
+    """Fast equivalent of `extract_json_objects_containing_key`.
+
+    Script blocks are located with a couple of regex searches instead of an HTML parse, and only those whose raw
+    text contains `"key":` are decoded, so there is no recursive walk afterwards. Duplicates are dropped by
+    their raw text before decoding. Keys written with `\\u` escapes in the page are not matched.
+    """
+
+    found = []
+    for content in ScriptScanner(key).feed(html):
+        try:
+            found.append(json.loads(content))
+        except json.JSONDecodeError:
+            pass
+
+    return found
+
+
+class ScriptScanner:
+    """`scan_json_objects_containing_key` for a page that is still downloading.
+
+    `feed` takes the page chunk by chunk and returns the raw text of every matching script block as soon as
+    its closing tag has arrived, so the caller can stop downloading once it has the one it needs. Decoding is
+    left to the caller. The part of the page already scanned is dropped as it goes.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.needle = re.compile(re.escape(json.dumps(key)) + r"\s*:")
+        self.seen: set[str] = set()
+        self.bytes_read = 0
+
+        self._html = ""
+        self._position = 0
+        self._open: Optional[tuple[int, bool]] = None  # (content start, is JSON) of a script not closed yet
+        self._close_from = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def feed(self, chunk: Union[str, bytes]) -> list[str]:
+        if isinstance(chunk, bytes):
+            self.bytes_read += len(chunk)
+            chunk = self._decoder.decode(chunk)
+
+        base = self._open[0] if self._open is not None else self._position
+        if base >= _TRIM_AT:
+            self._html = self._html[base:]
+            self._position -= base
+            self._close_from = max(0, self._close_from - base)
+            if self._open is not None:
+                self._open = (0, self._open[1])
+        self._html += chunk
+
+        html = self._html
+        found = []
+        while True:
+            if self._open is None:
+                match = _SCRIPT_OPEN.search(html, self._position)
+                if match is None:
+                    # Whatever follows the last "<" may be the start of an opening tag cut in half
+                    last = html.rfind("<", self._position)
+                    self._position = last if last != -1 else len(html)
+                    return found
+
+                self._open = (match.end(), _JSON_TYPE.search(match.group(1)) is not None)
+                self._close_from = match.end()
+
+            start, is_json = self._open
+            close = _SCRIPT_CLOSE.search(html, self._close_from)
+            if close is None:
+                # The closing tag may be cut in half too; don't rescan the rest of the script next time
+                self._close_from = max(start, len(html) - 16)
+                return found
+
+            self._open = None
+            self._position = close.end()
+
+            content = html[start : close.start()]
+            if is_json and content not in self.seen and _has_key(content, self.needle):
+                self.seen.add(content)
+                found.append(content)
+
+
+def _has_key(content: str, needle: re.Pattern) -> bool:
+    # A lookbehind for the backslash would stop the regex engine from jumping between literal matches
+    return any(match.start() == 0 or content[match.start() - 1] != "\\" for match in needle.finditer(content))
+
+
 def json_contains_key(obj, key: str) -> bool:
     """Recursively check if a python object (parsed json) contains the string key anywhere."""
     if isinstance(obj, dict):
@@ -41,17 +139,82 @@ def json_contains_key(obj, key: str) -> bool:
 
 
 def deep_find(obj, key: str):
-    """Recursively find the first occurrence of a key in nested dict/list."""
-    if isinstance(obj, dict):
-        if key in obj:
-            return obj[key]
-        for v in obj.values():
-            result = deep_find(v, key)
-            if result is not None:
-                return result
-    elif isinstance(obj, list):
-        for item in obj:
-            result = deep_find(item, key)
-            if result is not None:
-                return result
-    return None
+    """Find the first occurrence of a key in nested dict/list (depth-first, without recursion)."""
+    return _find_path(obj, key)[1]
+
+
+class KeyFinder:
+    """`deep_find` for documents of the same shape, remembering where the key was found last time.
+
+    The next lookup first follows the remembered path directly and only falls back to a full search when
+    the path no longer leads to a value. Hits and misses are counted to tell how stable the shape is.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.path: Optional[tuple] = None
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, obj):
+        if self.path is not None:
+            value = _follow(obj, self.path)
+            if value is not None:
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        path, value = _find_path(obj, self.key)
+        if path is not None:
+            self.path = path
+        return value
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def _follow(obj, path: tuple):
+    for step in path:
+        if isinstance(obj, dict):
+            if step not in obj:
+                return None
+        elif isinstance(obj, list):
+            if not isinstance(step, int) or step >= len(obj):
+                return None
+        else:
+            return None
+        obj = obj[step]
+    return obj
+
+
+def _find_path(obj, key: str) -> tuple[Optional[tuple], object]:
+    """Depth-first search in the same order as a recursive walk, returning the path to the first value found.
+
+    Like the recursive version, a `None` value stops the search inside its own dict but not in its siblings.
+    """
+
+    # Entries are (node, parent entry, step from the parent) so paths are only built for the match
+    stack = [(obj, None, None)]
+    while stack:
+        entry = stack.pop()
+        node = entry[0]
+
+        if isinstance(node, dict):
+            if key in node:
+                if node[key] is None:
+                    continue
+
+                path = [key]
+                while entry[1] is not None:
+                    path.append(entry[2])
+                    entry = entry[1]
+                return tuple(reversed(path)), node[key]
+
+            stack.extend((child, entry, step) for step, child in reversed(node.items()) if isinstance(child, (dict, list)))
+        elif isinstance(node, list):
+            stack.extend(
+                (node[i], entry, i) for i in range(len(node) - 1, -1, -1) if isinstance(node[i], (dict, list))
+            )
+
+    return None, None
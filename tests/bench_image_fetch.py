@@ -0,0 +1,135 @@
+"""Benchmark of the image fetch for OCR: the previous whole-body download and full decode vs. the streamed,
+size-capped download and region decode. Synthetic promo-sized images are served over a local HTTP server;
+time is the best of several runs, memory the peak RSS growth of a fresh process fetching the image once
+(read from /proc, so Linux only).
+
+Run from the repository root:
+
+    python tests/bench_image_fetch.py
+"""
+
+import io
+import sys
+import time
+import threading
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, "src")
+
+from utils.http import HTTPClient  # noqa: E402
+from utils.ocr import MIN_CODE_AREA_HEIGHT, load_code_area  # noqa: E402
+
+
+def previous_fetch(url: str, http: HTTPClient) -> Image.Image:
+    response = http.get(url)
+    response.raise_for_status()
+
+    image = Image.open(io.BytesIO(response.content))
+    width, height = image.size
+    return image.crop((width * 0.1, height * 0.62, width * 0.9, height * 0.8)).convert("RGB")
+
+
+def bounded_fetch(url: str, http: HTTPClient) -> Image.Image:
+    return load_code_area(url, http)[2]
+
+
+FETCHES = {"previous": previous_fetch, "bounded": bounded_fetch}
+
+
+def promo_image(size: int, format: str) -> bytes:
+    rng = np.random.default_rng(size)
+    gradient = np.linspace(40, 220, size)[:, None, None] * np.ones((1, size, 3))
+    pixels = np.clip(gradient + rng.normal(0, 12, (size, size, 3)), 0, 255).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format, **({"quality": 90} if format == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+def serve(images: dict[str, bytes]) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = images[self.path]
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def peak_rss() -> int:
+    """High-water mark of this process's resident memory, in KB."""
+
+    # Unlike ru_maxrss, which survives exec and so starts out at the parent's peak
+    with open("/proc/self/status", "r") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+
+
+def peak_memory(fetch: str, url: str, result: multiprocessing.Queue) -> None:
+    http = HTTPClient()
+    before = peak_rss()
+    FETCHES[fetch](url, http)
+    result.put(peak_rss() - before)
+
+
+def measure_memory(fetch: str, url: str) -> float:
+    """Peak RSS growth in MB, in a fresh process so earlier runs don't hide it."""
+
+    result = multiprocessing.get_context("spawn").Queue()
+    process = multiprocessing.get_context("spawn").Process(target=peak_memory, args=(fetch, url, result))
+    process.start()
+    process.join()
+    return result.get() / 1024
+
+
+def bench(func, *args, repeat: int = 10) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    images = {
+        f"/{size}.{format.lower()}": promo_image(size, format)
+        for size, format in ((1080, "PNG"), (1080, "JPEG"), (2048, "JPEG"), (4096, "JPEG"))
+    }
+    server = serve(images)
+    http = HTTPClient()
+
+    print(f"{'':<12} {'size':>8} {'previous':>20} {'bounded':>20}")
+    for path, data in images.items():
+        url = f"http://127.0.0.1:{server.server_port}{path}"
+
+        previous, bounded = previous_fetch(url, http), bounded_fetch(url, http)
+        if path.endswith(".png"):
+            assert np.array_equal(np.asarray(previous), np.asarray(bounded)), f"{path}: the crops differ"
+        else:
+            assert bounded.height >= min(previous.height, MIN_CODE_AREA_HEIGHT), f"{path}: the crop is too small"
+
+        times = [bench(FETCHES[name], url, http) for name in FETCHES]
+        memory = [measure_memory(name, url) for name in FETCHES]
+        print(
+            f"{path[1:]:<12} {len(data) / 1024:6.0f} KB"
+            f" {times[0] * 1000:7.1f} ms {memory[0]:6.1f} MB"
+            f" {times[1] * 1000:7.1f} ms {memory[1]:6.1f} MB"
+            f"  (crop {previous.width}x{previous.height} -> {bounded.width}x{bounded.height})"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
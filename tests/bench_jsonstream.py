@@ -0,0 +1,89 @@
+"""Benchmark of the early-exit JSON stream vs. `json.load` for the latest Instagram and X posts: parse time and
+peak memory (tracemalloc) on the `data/mock_*.json` fixtures, read from disk in download-sized chunks.
+
+Run from the repository root:
+
+    python tests/bench_jsonstream.py
+"""
+
+import io
+import sys
+import json
+import time
+import tracemalloc
+
+sys.path.insert(0, "src")
+
+from utils.http import STREAM_CHUNK_SIZE  # noqa: E402
+from utils.jsonstream import iter_items  # noqa: E402
+from integrations import InstagramAPI, XTwitterAPI  # noqa: E402
+
+
+def chunks(data: bytes):
+    stream = io.BytesIO(data)
+    return iter(lambda: stream.read(STREAM_CHUNK_SIZE), b"")
+
+
+def full_instagram(api, data):
+    return api._parse_latest_post(json.load(io.BytesIO(data))["data"]["user"], "user")
+
+
+def streamed_instagram(api, data):
+    edge = next(iter_items(chunks(data), api.TIMELINE_EDGES_PATH), None)
+    return api._parse_media((edge or {}).get("node"), "user")
+
+
+def full_x(api, data):
+    return api._parse_latest_post(json.load(io.BytesIO(data)), "user")
+
+
+def streamed_x(api, data):
+    tweets = {}
+    for entry in iter_items(chunks(data), api.TIMELINE_ENTRIES_PATH):
+        if api._collect_tweets(tweets, entry, None):
+            break
+    return api._latest_post(api._sort_tweets(tweets), "user")
+
+
+def bench(func, *args, repeat: int = 200) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def main():
+    instagram, x = InstagramAPI(), XTwitterAPI("", "")
+
+    cases = [
+        ("Instagram", "data/mock_instagram_profile.json", instagram, full_instagram, streamed_instagram),
+        ("X", "data/mock_x_user_tweets.json", x, full_x, streamed_x),
+    ]
+
+    print(f"{'':<10} {'size':>8} {'json.load':>22} {'stream':>22}")
+    for name, path, api, full, streamed in cases:
+        with open(path, "rb") as f:
+            data = f.read()
+
+        expected, post = full(api, data), streamed(api, data)
+        assert post == expected, f"{name}: the streamed post differs"
+
+        (full_time, full_peak), (stream_time, stream_peak) = bench(full, api, data), bench(streamed, api, data)
+        print(
+            f"{name:<10} {len(data) / 1024:6.0f} KB"
+            f" {full_time * 1000:7.3f} ms {full_peak / 1024:7.0f} KB"
+            f" {stream_time * 1000:7.3f} ms {stream_peak / 1024:7.0f} KB"
+            f"  ({full_time / stream_time:.1f}x faster, {full_peak / stream_peak:.1f}x less memory)"
+        )
+
+
+if __name__ == "__main__":
+    main()
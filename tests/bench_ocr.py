@@ -0,0 +1,77 @@
+"""Benchmark of OCR on synthetic promo images: per-image latency (wall clock and CPU time of this process) of
+decoding the code area and of reading it, and accuracy.
+
+Needs EasyOCR and its models. Run from the repository root:
+
+    python tests/bench_ocr.py
+"""
+
+import io
+import sys
+import time
+import random
+import statistics
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+sys.path.insert(0, "src")
+
+from utils.ocr import OCREngine, crop_code_area  # noqa: E402
+
+ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+
+def promo_image(code: str, rng: random.Random, size: int = 1080) -> bytes:
+    """A promo post: gradient background, a headline, and the code on a panel in the code band."""
+
+    top, bottom = [tuple(rng.randrange(256) for _ in range(3)) for _ in range(2)]
+    image = Image.new("RGB", (size, size))
+    draw = ImageDraw.Draw(image)
+    for y in range(size):
+        draw.line([(0, y), (size, y)], fill=tuple(a + (b - a) * y // size for a, b in zip(top, bottom)))
+
+    draw.text((size // 2, size // 5), "NEW PROMOCODE", font=ImageFont.load_default(size=size // 12), anchor="mm")
+
+    # The panel and the code sit in the default template's band (62-80% of the height)
+    dark = rng.random() < 0.5
+    panel, ink = ((20, 20, 30), (250, 250, 250)) if dark else ((245, 240, 230), (15, 15, 20))
+    draw.rounded_rectangle((size * 0.15, size * 0.64, size * 0.85, size * 0.78), radius=size // 40, fill=panel)
+    draw.text((size // 2, size * 0.71), code, font=ImageFont.load_default(size=size // 11), fill=ink, anchor="mm")
+
+    image = image.filter(ImageFilter.GaussianBlur(0.8))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def bench(engine: OCREngine, samples: list[tuple[str, bytes]]) -> tuple[float, float, float]:
+    walls, cpus, correct = [], [], 0
+    for code, data in samples:
+        crop = crop_code_area(data)
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        lines = engine.read(crop)
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+        correct += bool(lines) and lines[0].strip() == code
+    return statistics.median(walls), statistics.median(cpus), correct / len(samples)
+
+
+def main():
+    rng = random.Random(42)
+    samples = [(code, promo_image(code, rng)) for code in ("".join(rng.choices(ALPHABET, k=8)) for _ in range(40))]
+
+    start = time.perf_counter()
+    for _, data in samples:
+        crop_code_area(data)
+    print(f"decoding the code area: {(time.perf_counter() - start) / len(samples) * 1000:.2f} ms per image")
+
+    engine = OCREngine()
+    engine.warm_up()
+    wall, cpu, accuracy = bench(engine, samples)
+    print(f"reading: {wall * 1000:.1f} ms wall, {cpu * 1000:.1f} ms CPU per image, {accuracy:.0%} read correctly")
+
+
+if __name__ == "__main__":
+    main()
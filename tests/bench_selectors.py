@@ -0,0 +1,170 @@
+"""Micro-benchmark of the platform parsers: selector-based vs. the previous hand-written `.get()` chains.
+
+Run from the repository root:
+
+    python tests/bench_selectors.py
+"""
+
+import sys
+import json
+import time
+from datetime import datetime
+
+sys.path.insert(0, "src")
+
+from models import Post  # noqa: E402
+from integrations import DiscordAPI, FacebookAPI, InstagramAPI, XTwitterAPI  # noqa: E402
+
+
+# Hand-written parsers as they were before the selector engine, kept here as the baseline
+
+
+def legacy_x(response, username):
+    instructions = (
+        response.get("data", {})
+        .get("user", {})
+        .get("result", {})
+        .get("timeline_v2", {})
+        .get("timeline", {})
+        .get("instructions", [])
+    )
+
+    contents = []
+    for instruction in instructions:
+        if instruction.get("type") == "TimelineAddEntries":
+            entries = instruction.get("entries", [])
+        elif instruction.get("type") == "TimelinePinEntry":
+            entries = [instruction.get("entry", {})]
+        else:
+            continue
+
+        for entry in entries:
+            content = entry.get("content", {})
+            if "itemContent" in content:
+                contents.append(content)
+            else:
+                contents.extend(item.get("item", {}) for item in content.get("items", []))
+
+    tweets = {}
+    for content in contents:
+        result = content.get("itemContent", {}).get("tweet_results", {}).get("result", {})
+        tweet = result.get("tweet", result).get("legacy", {})
+        if tweet.get("id_str"):
+            tweets[tweet["id_str"]] = tweet
+
+    tweet = sorted(tweets.values(), key=lambda tweet: int(tweet["id_str"]), reverse=True)[0]
+    media = tweet.get("entities", {}).get("media", [{}])[0]
+
+    return Post(
+        platform="X",
+        author=username,
+        author_url=f"https://x.com/{username}",
+        text=tweet.get("full_text", ""),
+        url=media.get("url") or f"https://x.com/{username}/status/{tweet['id_str']}",
+        media_url=media.get("media_url_https", None),
+        created_at=datetime.strptime(tweet.get("created_at", ""), "%a %b %d %H:%M:%S %z %Y"),
+        raw_data=tweet,
+    )
+
+
+def legacy_facebook(data):
+    edges = data.get("timeline_list_feed_units", {}).get("edges", [])
+    comet_sections = edges[0].get("node", {}).get("comet_sections", {})
+    story = comet_sections.get("content", {}).get("story", {})
+    actor = (story.get("actors") or [{}])[0]
+    attachment = (story.get("attachments") or [{}])[0]
+
+    return Post(
+        platform="Facebook",
+        author=actor.get("name", "unknown"),
+        author_url=actor.get("url", ""),
+        text=(story.get("message") or {}).get("text", ""),
+        url=story.get("wwwURL", ""),
+        media_url=attachment.get("styles", {})
+        .get("attachment", {})
+        .get("media", {})
+        .get("photo_image", {})
+        .get("uri", ""),
+        created_at=datetime.fromtimestamp(comet_sections.get("timestamp", {}).get("story", {}).get("creation_time", 0)),
+        raw_data=data,
+    )
+
+
+def legacy_instagram(profile, username):
+    edges = profile.get("edge_owner_to_timeline_media", {}).get("edges", [])
+    latest_post = edges[0].get("node", None)
+
+    return Post(
+        platform="Instagram",
+        author=username,
+        author_url=f"https://www.instagram.com/{username}/",
+        text=latest_post.get("edge_media_to_caption", {}).get("edges", [{}])[0].get("node", {}).get("text", ""),
+        url=f"https://www.instagram.com/p/{latest_post.get('shortcode', '')}/",
+        media_url=latest_post.get("display_url", None),
+        created_at=datetime.fromtimestamp(latest_post.get("taken_at_timestamp", 0)),
+        raw_data=latest_post,
+    )
+
+
+def legacy_discord(response, guild_id, channel_id):
+    message = max(response, key=lambda message: int(message.get("id", 0)))
+    author_info = message.get("author", {})
+
+    return Post(
+        platform="Discord",
+        author=author_info.get("username", ""),
+        author_url=f"https://discord.com/users/{author_info.get('id', '')}",
+        text=message.get("content", ""),
+        url=f"https://discord.com/channels/{guild_id}/{channel_id}/{message.get('id', '')}",
+        media_url=(message.get("attachments") or [{}])[0].get("url", None),
+        created_at=datetime.fromisoformat(message.get("timestamp", "")),
+        raw_data=message,
+    )
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def bench(*funcs, repeat: int = 1000, rounds: int = 20) -> list[float]:
+    """Best time per call of each function. Rounds alternate between them so that noise on a busy machine
+    hits every one alike."""
+
+    best = [float("inf")] * len(funcs)
+    for _ in range(rounds):
+        for i, func in enumerate(funcs):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            best[i] = min(best[i], (time.perf_counter() - start) / repeat)
+    return best
+
+
+def main():
+    x = load("data/mock_x_user_tweets.json")
+    facebook = load("data/mock_facebook_user.json")
+    instagram = load("data/mock_instagram_profile.json")["data"]["user"]
+    discord = load("data/mock_discord_messages.json")
+
+    x_api, facebook_api, instagram_api, discord_api = XTwitterAPI("", ""), FacebookAPI(), InstagramAPI(), DiscordAPI("")
+
+    cases = [
+        ("X", lambda: legacy_x(x, "user"), lambda: x_api._parse_latest_post(x, "user")),
+        ("Facebook", lambda: legacy_facebook(facebook), lambda: facebook_api._parse_latest_post(facebook)),
+        ("Instagram", lambda: legacy_instagram(instagram, "user"), lambda: instagram_api._parse_latest_post(instagram, "user")),
+        ("Discord", lambda: legacy_discord(discord, "g", "c"), lambda: discord_api._parse_latest_post(discord, "g", "c")),
+    ]
+
+    print(f"{'':<10} {'.get() chains':>14} {'selectors':>14}")
+    for name, legacy, selectors in cases:
+        expected, post = legacy(), selectors()
+        for field in ("author", "author_url", "text", "url", "media_url", "created_at"):
+            assert getattr(post, field) == getattr(expected, field), f"{name}: {field} differs"
+
+        before, after = bench(legacy, selectors)
+        print(f"{name:<10} {before * 1e6:11.1f} us {after * 1e6:11.1f} us  ({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
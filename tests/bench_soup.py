@@ -0,0 +1,116 @@
+"""Benchmark of the Facebook JSON extraction: BeautifulSoup reference vs. the raw-text scanner, how much of the
+page the streamed `ScriptScanner` reads before the feed turns up, and a full `deep_find` for the "user" payload
+vs. the path-remembering `KeyFinder`.
+
+Run from the repository root:
+
+    python tests/bench_soup.py                      # synthetic page built around data/mock_facebook_user.json
+    python tests/bench_soup.py page1.html page2.html  # saved Facebook pages
+"""
+
+import sys
+import json
+import time
+import random
+
+sys.path.insert(0, "src")
+
+from utils.soup import (  # noqa: E402
+    KeyFinder,
+    ScriptScanner,
+    deep_find,
+    extract_json_objects_containing_key,
+    scan_json_objects_containing_key,
+)
+
+KEY = "timeline_list_feed_units"
+CHUNK_SIZE = 1 << 14
+
+
+def synthetic_page(size: int = 3_000_000) -> str:
+    """A page shaped like a Facebook profile: markup, inline JS and many `application/json` data scripts."""
+
+    with open("data/mock_facebook_user.json", "r", encoding="utf-8") as f:
+        user = json.load(f)
+
+    rng = random.Random(0)
+    payload = json.dumps({"require": [["ScheduledServerJS", "handle", None, [{"__bbox": {"result": {"data": {"user": user}}}}]]]})
+
+    parts = ["<!DOCTYPE html><html><head><title>Facebook</title></head><body>"]
+    total = 0
+    while total < size:
+        kind = rng.random()
+        if kind < 0.5:
+            blob = json.dumps({"require": [["Bootloader", "handlePayload", None, [{"id": rng.random(), "rsrc": "x" * rng.randint(200, 5000)}]]]})
+            part = f'<script type="application/json" data-content-len="{len(blob)}" data-sjs>{blob}</script>'
+        elif kind < 0.7:
+            part = f"<script>requireLazy([\"TimeSliceImpl\"], function(t) {{ t.guard({rng.random()}); }});</script>"
+        else:
+            part = f'<div class="x1n2onr6" data-id="{rng.random()}">' + "<span>text</span>" * rng.randint(5, 50) + "</div>"
+
+        parts.append(part)
+        total += len(part)
+
+        # The payload shows up twice, like the real page does
+        if len(parts) in (200, 400):
+            parts.append(f'<script type="application/json" data-content-len="{len(payload)}" data-sjs>{payload}</script>')
+
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def scan_until_match(page: bytes, key: str):
+    """Feed the page in download-sized chunks and stop at the first match, like `FacebookAPI` does."""
+
+    scanner = ScriptScanner(key)
+    for start in range(0, len(page), CHUNK_SIZE):
+        matches = scanner.feed(page[start : start + CHUNK_SIZE])
+        if matches:
+            return scanner.bytes_read, matches[0]
+    return None
+
+
+def bench(name, func, document, repeat: int) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(document, KEY)
+        best = min(best, time.perf_counter() - start)
+
+    matches = f"{len(result)} match(es)" if isinstance(result, list) else type(result).__name__
+    print(f"  {name:<40} {best * 1000:8.3f} ms  ({matches})")
+    return best, result
+
+
+def main():
+    pages = [(path, open(path, "r", encoding="utf-8").read()) for path in sys.argv[1:]] or [("synthetic", synthetic_page())]
+
+    for name, html in pages:
+        print(f"{name}: {len(html) / 1e6:.1f} MB")
+        reference, expected = bench("extract_json_objects_containing_key", extract_json_objects_containing_key, html, 3)
+        fast, found = bench("scan_json_objects_containing_key", scan_json_objects_containing_key, html, 10)
+
+        assert found == expected, "the scanner disagrees with the reference implementation"
+        print(f"  speedup: {reference / fast:.0f}x")
+
+        streamed, first = bench("ScriptScanner (until the first match)", scan_until_match, html.encode(), 10)
+        if first is not None:
+            read, content = first
+            assert json.loads(content) == found[0], "the streamed scanner found a different payload"
+            print(f"  read {read / 1e6:.2f} of {len(html.encode()) / 1e6:.2f} MB, {fast / streamed:.1f}x faster")
+
+        if not found:
+            continue
+
+        document = found[0]
+        finder = KeyFinder("user")
+        full, user = bench("deep_find", lambda doc, _: deep_find(doc, "user"), document, 100)
+        memo, memoised = bench("KeyFinder.find", lambda doc, _: finder.find(doc), document, 100)
+
+        assert memoised is user, "KeyFinder found a different user payload"
+        print(f"  speedup: {full / memo:.0f}x, {finder.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Local stand-in for the Discord Gateway.
+
+Replays the messages in data/mock_discord_messages.json as MESSAGE_CREATE events (with fresh IDs and
+timestamps) and speaks enough of the protocol to exercise the bot's gateway client: HELLO, IDENTIFY/READY,
+heartbeats, RESUME/RESUMED with replay of missed events, and server-requested reconnects.
+
+Set `DISCORD_GATEWAY_URL = "ws://127.0.0.1:8765"` in src/config.py, start this script from the repository
+root, then run the bot.
+"""
+
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime, timezone
+
+from aiohttp import web, WSMsgType
+
+DISCORD_EPOCH = 1420070400000
+
+
+def snowflake(counter: int) -> str:
+    return str(((int(time.time() * 1000) - DISCORD_EPOCH) << 22) | (counter & 0xFFF))
+
+
+class FakeGateway:
+    def __init__(self, messages: list[dict], interval: float, reconnect_every: int, heartbeat_interval: int) -> None:
+        self.messages = messages
+        self.interval = interval
+        self.reconnect_every = reconnect_every
+        self.heartbeat_interval = heartbeat_interval
+
+        self.sessions: dict[str, list[dict]] = {}  # session ID -> every event sent so far
+        self.counter = 0
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_json({"op": 10, "d": {"heartbeat_interval": self.heartbeat_interval}, "s": None, "t": None})
+
+        session_id = None
+        replayer = None
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+
+                payload = json.loads(message.data)
+                op = payload.get("op")
+
+                if op == 1:
+                    await ws.send_json({"op": 11})
+                elif op == 2:
+                    session_id = f"session-{len(self.sessions) + 1}"
+                    self.sessions[session_id] = []
+                    print(f"IDENTIFY -> READY ({session_id})")
+                    await self.dispatch(ws, session_id, "READY", {
+                        "session_id": session_id,
+                        "resume_gateway_url": f"ws://{request.host}",
+                        "user": {"id": "1", "username": "fake"},
+                    })
+                    replayer = asyncio.create_task(self.replay(ws, session_id))
+                elif op == 6:
+                    data = payload["d"]
+                    if data["session_id"] not in self.sessions:
+                        print(f"RESUME of unknown session {data['session_id']} -> INVALID_SESSION")
+                        await ws.send_json({"op": 9, "d": False})
+                        continue
+
+                    session_id = data["session_id"]
+                    missed = [event for event in self.sessions[session_id] if event["s"] > (data["seq"] or 0)]
+                    print(f"RESUME ({session_id}, seq {data['seq']}) -> replaying {len(missed)} missed event(s)")
+                    for event in missed:
+                        await ws.send_json(event)
+                    await self.dispatch(ws, session_id, "RESUMED", {})
+                    replayer = asyncio.create_task(self.replay(ws, session_id))
+        finally:
+            if replayer is not None:
+                replayer.cancel()
+
+        return ws
+
+    async def dispatch(self, ws: web.WebSocketResponse, session_id: str, event: str, data: dict) -> None:
+        events = self.sessions[session_id]
+        payload = {"op": 0, "s": len(events) + 1, "t": event, "d": data}
+        events.append(payload)
+        if not ws.closed:
+            await ws.send_json(payload)
+
+    async def replay(self, ws: web.WebSocketResponse, session_id: str) -> None:
+        sent = 0
+        while not ws.closed:
+            await asyncio.sleep(self.interval)
+
+            self.counter += 1
+            message = dict(self.messages[self.counter % len(self.messages)])
+            message["id"] = snowflake(self.counter)
+            message["timestamp"] = datetime.now(timezone.utc).isoformat()
+            await self.dispatch(ws, session_id, "MESSAGE_CREATE", message)
+            print(f"MESSAGE_CREATE {message['id']} in channel {message.get('channel_id')}")
+
+            sent += 1
+            if self.reconnect_every and sent % self.reconnect_every == 0:
+                print("RECONNECT")
+                await ws.send_json({"op": 7, "d": None})
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Discord Gateway replaying mock messages.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between replayed messages")
+    parser.add_argument("--reconnect-every", type=int, default=3, help="ask for a reconnect every N messages (0: never)")
+    parser.add_argument("--heartbeat-interval", type=int, default=10000, help="milliseconds")
+    args = parser.parse_args()
+
+    with open("data/mock_discord_messages.json", "r", encoding="utf-8") as f:
+        messages = json.load(f)
+
+    gateway = FakeGateway(messages, args.interval, args.reconnect_every, args.heartbeat_interval)
+
+    app = web.Application()
+    app.router.add_get("/", gateway.handle)
+    web.run_app(app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()